@@ -1,24 +1,47 @@
-from fastapi import FastAPI, HTTPException, status, Request
+from fastapi import FastAPI, Header, HTTPException, Query, status, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.exceptions import RequestValidationError
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
-import json, uuid, time, random
+import json, uuid, time
 import pytz
+from typing import List, Optional
+import hmac
 import os
 import logging
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from utils import emailer
+from utils.admission import AdmissionMiddleware, ConcurrencyLimiter, RateLimiter
+from utils.archive import ArchiveJob
+from utils.availability import AvailabilityEngine
+from utils.booking import BookingEngine
+from utils.idempotency import IDEMPOTENT_REQUESTS, IdempotencyCache, IdempotencyInProgress, IdempotencyMismatch
+from utils.metrics import REGISTRY, MetricsMiddleware, SamplingProfiler, record_io
+from utils.logging_setup import AccessLogMiddleware, configure_logging, parse_sample_rates, stop_logging
+from utils.otp import MemoryOtpStore, SqliteOtpStore, generate_otp
+from utils.pubsub import PubSubHub
+from utils.queue_index import QueueIndex
+from utils.reminders import ReminderScheduler
+from utils.static_assets import StaticAssets
+from utils.repository import BookingConflict, JsonRepository
+from utils.response_cache import LRUCache
+from utils.schedule import Schedule
+from utils.serialization import FastJSONResponse, dumps
+from utils.singleflight import SingleFlight
+from utils.sqlite_repository import SqliteRepository
+from utils.stats import OccupancyStats
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: records are queued and written by a background listener
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE_RATES = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+configure_logging(LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATES)
 logger = logging.getLogger(__name__)
 
 class LoginRequest(BaseModel):
@@ -33,30 +56,73 @@ class BookSlotRequest(BaseModel):
     email: str
     slot: str
 
+class ClearNotificationsRequest(BaseModel):
+    ids: List[str] = []
+    email: Optional[str] = None
+    all: bool = False
+
+class BulkImportRequest(BaseModel):
+    bookings: List[BookSlotRequest]
+
+class BulkCancelRequest(BaseModel):
+    ids: List[str]
+
+class ProfilerRequest(BaseModel):
+    enabled: bool
+    interval_ms: float = 10
+    reset: bool = False
+
 
 # ---------------- APP SETUP ---------------- #
 
-app = FastAPI(title="ServeQ Backend", version="1.0.0")
+app = FastAPI(title="ServeQ Backend", version="1.0.0", default_response_class=FastJSONResponse)
 
 # CORS configuration - Frontend and backend on same Render service
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
 ALLOWED_ORIGINS = [origin.strip() for origin in ALLOWED_ORIGINS]
 
-logger.info(f"Configured CORS origins: {ALLOWED_ORIGINS}")
+logger.info("Configured CORS origins: %s", ALLOWED_ORIGINS)
+
+# Admission control for the login/booking hot paths: per-IP and per-email token
+# buckets, then a concurrency cap per route with a short wait queue. Rejections
+# are 429/503 with Retry-After; a rate of 0 or a cap of 0 disables that check.
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "120"))
+RATE_LIMIT_IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", "60"))
+RATE_LIMIT_EMAIL_PER_MINUTE = float(os.getenv("RATE_LIMIT_EMAIL_PER_MINUTE", "10"))
+RATE_LIMIT_EMAIL_BURST = int(os.getenv("RATE_LIMIT_EMAIL_BURST", "5"))
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", "16"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+# Reverse proxies in front of the app that append to X-Forwarded-For (1 on Heroku/Render)
+RATE_LIMIT_PROXY_HOPS = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "0"))
+
+app.add_middleware(
+    AdmissionMiddleware,
+    routes={
+        path: ConcurrencyLimiter(ADMISSION_CONCURRENCY, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT)
+        for path in ("/api/login", "/api/book")
+    },
+    ip_limiter=RateLimiter(RATE_LIMIT_IP_PER_MINUTE / 60, RATE_LIMIT_IP_BURST),
+    email_limiter=RateLimiter(RATE_LIMIT_EMAIL_PER_MINUTE / 60, RATE_LIMIT_EMAIL_BURST),
+    proxy_hops=RATE_LIMIT_PROXY_HOPS
+)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(AccessLogMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "OPTIONS"],
-    allow_headers=["Content-Type"],
+    allow_headers=["Content-Type", "If-None-Match", "X-Admin-Token", "X-Request-ID", "Idempotency-Key"],
+    expose_headers=["X-Request-ID", "Idempotent-Replayed"],
 )
 
 
 # Global exception handlers for proper error responses
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    logger.warning(f"Validation error on {request.url.path}: {exc}")
+    logger.warning("Validation error on %s: %s", request.url.path, exc)
     return JSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={
@@ -68,18 +134,19 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    logger.warning(f"HTTP exception on {request.url.path}: {exc.detail}")
+    logger.warning("HTTP exception on %s: %s", request.url.path, exc.detail)
     return JSONResponse(
         status_code=exc.status_code,
         content={
             "success": False,
             "detail": exc.detail
-        }
+        },
+        headers=exc.headers
     )
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Unhandled exception on {request.url.path}", exc_info=exc)
+    logger.error("Unhandled exception on %s", request.url.path, exc_info=exc)
     return JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={
@@ -95,9 +162,9 @@ IST = pytz.timezone("Asia/Kolkata")
 DATA_DIR = Path("data")
 try:
     DATA_DIR.mkdir(exist_ok=True)
-    logger.info(f"Data directory ready: {DATA_DIR.resolve()}")
+    logger.info("Data directory ready: %s", DATA_DIR.resolve())
 except Exception as e:
-    logger.error(f"Failed to create data directory: {e}")
+    logger.error("Failed to create data directory: %s", e)
     raise
 
 USERS_FILE = DATA_DIR / "users.json"
@@ -105,13 +172,141 @@ BOOKINGS_FILE = DATA_DIR / "bookings.json"
 NOTIFICATIONS_FILE = DATA_DIR / "notifications.json"
 SLOTS_FILE = DATA_DIR / "slots.json"
 
-OTP_STORE = {}
+# Number of uvicorn worker processes (uvicorn reads WEB_CONCURRENCY as its --workers default)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Storage engine: "json" (in-memory, journaled to data/journal.log and compacted
+# into the JSON files) or "sqlite" (data/serveq.db in WAL mode). Multiple workers
+# need state every process can see, so they default to (and require) sqlite.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite" if WEB_CONCURRENCY > 1 else "json").lower()
+SQLITE_PATH = Path(os.getenv("SQLITE_PATH", str(DATA_DIR / "serveq.db")))
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+JOURNAL_COMPACT_ENTRIES = int(os.getenv("JOURNAL_COMPACT_ENTRIES", "5000"))
+JOURNAL_COMPACT_INTERVAL = float(os.getenv("JOURNAL_COMPACT_INTERVAL", "60"))
+# JSON backend snapshot encoding: "pretty" (indented JSON), "compact" (minified JSON) or "msgpack"
+SNAPSHOT_FORMAT = os.getenv("SNAPSHOT_FORMAT", "pretty").lower()
+
+if STORAGE_BACKEND == "sqlite":
+    # A brand-new database is seeded from the existing data/*.json files
+    repository = SqliteRepository(SQLITE_PATH, pool_size=SQLITE_POOL_SIZE, seed_dir=DATA_DIR)
+elif STORAGE_BACKEND == "json":
+    repository = JsonRepository(
+        DATA_DIR,
+        compact_entries=JOURNAL_COMPACT_ENTRIES,
+        compact_interval=JOURNAL_COMPACT_INTERVAL,
+        snapshot_format=SNAPSHOT_FORMAT
+    )
+else:
+    raise RuntimeError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+
+if WEB_CONCURRENCY > 1 and STORAGE_BACKEND != "sqlite":
+    raise RuntimeError("WEB_CONCURRENCY > 1 requires STORAGE_BACKEND=sqlite")
+
+# OTPs must be visible to whichever worker receives /api/verify-otp
+OTP_TTL_SECONDS = 300
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+OTP_STORE_CAPACITY = int(os.getenv("OTP_STORE_CAPACITY", "100000"))
+if STORAGE_BACKEND == "sqlite":
+    OTP_STORE = SqliteOtpStore(SQLITE_PATH, capacity=OTP_STORE_CAPACITY, max_attempts=OTP_MAX_ATTEMPTS)
+else:
+    OTP_STORE = MemoryOtpStore(capacity=OTP_STORE_CAPACITY, max_attempts=OTP_MAX_ATTEMPTS)
+
+logger.info("Storage backend: %s (%s worker(s))", STORAGE_BACKEND, WEB_CONCURRENCY)
+
+# Booking check-and-reserve, serialized per slot and per email via striped locks
+BOOKING_LOCK_STRIPES = int(os.getenv("BOOKING_LOCK_STRIPES", "64"))
+booking_engine = BookingEngine(repository, stripes=BOOKING_LOCK_STRIPES)
+# Largest list accepted by the batch endpoints
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "1000"))
+# Default and largest page returned by cursor polls of /api/notifications
+NOTIFICATIONS_PAGE_SIZE = int(os.getenv("NOTIFICATIONS_PAGE_SIZE", "50"))
+MAX_NOTIFICATIONS_PAGE_SIZE = int(os.getenv("MAX_NOTIFICATIONS_PAGE_SIZE", "500"))
+
+# Slot availability bitmaps; other workers' bookings are picked up after a short refresh window
+MAX_SLOT_RANGE_DAYS = 31
+availability = AvailabilityEngine(repository, refresh_after=1.0 if WEB_CONCURRENCY > 1 else 0)
+booking_engine.add_listener(availability.mark)
+booking_engine.add_cancel_listener(availability.unmark)
+
+# Sorted slot starts per day for /api/queue positions
+queue_index = QueueIndex(repository, refresh_after=1.0 if WEB_CONCURRENCY > 1 else 0)
+booking_engine.add_listener(queue_index.add)
+booking_engine.add_cancel_listener(queue_index.remove)
+
+# Booking counters per date and slot for /api/admin/stats, kept across archiving
+MAX_STATS_RANGE_DAYS = 366
+stats = OccupancyStats(repository, refresh_after=60 if WEB_CONCURRENCY > 1 else 0)
+booking_engine.add_listener(stats.add)
+booking_engine.add_cancel_listener(stats.cancel)
+
+# REMINDER notifications at T-10 minutes; with several workers each one also
+# picks up the others' bookings from storage every 30 seconds
+reminders = ReminderScheduler(
+    repository,
+    now=lambda: now_ist(),
+    lead=600,
+    resync_interval=30 if WEB_CONCURRENCY > 1 else 0
+)
+booking_engine.add_listener(reminders.schedule)
+
+# Past-day bookings and cleared notifications move to per-month archive
+# segments, so the hot set (and every snapshot) only holds live records
+ARCHIVE_INTERVAL = int(os.getenv("ARCHIVE_INTERVAL", "3600"))
+archive_job = ArchiveJob(repository, today=lambda: now_ist().strftime("%Y-%m-%d"), interval=ARCHIVE_INTERVAL)
+archive_job.add_listener(availability.prune)
+archive_job.add_listener(queue_index.prune)
+
+# Server-sent event fan-out per email and per date. The hub is per process, so
+# with several workers a client only hears about changes made by its own worker.
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "32"))
+events = PubSubHub(queue_size=EVENT_QUEUE_SIZE)
+
+def publish_booking(booking):
+    start = datetime.fromisoformat(booking["slot_start"])
+    end = datetime.fromisoformat(booking["slot_end"])
+    events.publish(f"email:{booking['email']}", "booking", booking)
+    events.publish(f"date:{booking['slot_start'][:10]}", "slot_taken", {
+        "date": booking["slot_start"][:10],
+        "start": start.strftime("%I:%M %p"),
+        "end": end.strftime("%I:%M %p"),
+        "available": availability.remaining(booking["slot_start"])
+    })
+
+def publish_cancellation(booking):
+    events.publish(f"email:{booking['email']}", "booking_cancelled", booking)
+
+def publish_notification(notification):
+    events.publish(f"email:{notification['email']}", "notification", notification)
+
+booking_engine.add_listener(publish_booking)
+booking_engine.add_cancel_listener(publish_cancellation)
+reminders.add_listener(publish_notification)
+
+# Serialized /api/slots bodies keyed by (date, version, first bookable slot)
+SLOTS_CACHE_SIZE = int(os.getenv("SLOTS_CACHE_SIZE", "256"))
+slots_cache = LRUCache(SLOTS_CACHE_SIZE)
+# Versions are per process, so ETags carry a process token to stay unique across restarts and workers
+ETAG_INSTANCE = uuid.uuid4().hex[:8]
+
+# Completed /api/login and /api/book responses by Idempotency-Key, so client
+# retries are answered from memory. Per process, like the events hub.
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+idempotency = IdempotencyCache(capacity=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL, wait_timeout=10.0)
+
+# Polled reads (/api/slots, /api/notifications) run on a small dedicated pool,
+# and concurrent identical requests share one computation
+STORAGE_READ_WORKERS = int(os.getenv("STORAGE_READ_WORKERS", "4"))
+read_executor = ThreadPoolExecutor(max_workers=STORAGE_READ_WORKERS, thread_name_prefix="storage-read")
+reads = SingleFlight(read_executor)
 
 # Static file serving configuration
 BASE_DIR = Path(__file__).resolve().parent
 FRONTEND_DIR = BASE_DIR / "static"
 
-logger.info(f"Frontend directory configured: {FRONTEND_DIR}")
+static_assets = StaticAssets(FRONTEND_DIR)
+
+logger.info("Frontend directory configured: %s", FRONTEND_DIR)
 
 # Startup event to validate environment and initialize files
 @app.on_event("startup")
@@ -129,18 +324,45 @@ async def startup_event():
     for file_path, default in files_to_check:
         if not file_path.exists():
             try:
-                with open(file_path, "w") as f:
-                    json.dump(default, f, indent=2)
-                logger.info(f"Created data file: {file_path.name}")
+                write_json(file_path, default)
+                logger.info("Created data file: %s", file_path.name)
             except Exception as e:
-                logger.error(f"Failed to create {file_path.name}: {e}")
+                logger.error("Failed to create %s: %s", file_path.name, e)
                 raise
+
+    # Load snapshots and replay the journal; a corrupt snapshot must fail loudly
+    try:
+        repository.load()
+    except Exception as e:
+        logger.error("Failed to load data: %s", e)
+        raise
+    repository.start()
+
+    slot_config = read_json(SLOTS_FILE, {})
+    if slot_config.get("working_hours"):
+        try:
+            availability.configure(Schedule(slot_config))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error("Invalid slot configuration in slots.json: %s", e)
+            raise
+        availability.rebuild(repository.active_bookings())
+        queue_index.rebuild(repository.active_bookings())
+    else:
+        logger.error("Slot configuration missing from slots.json")
+    # Counts archived bookings too, so this is the one full scan; reports then use the counters
+    stats.rebuild(repository.scan_bookings())
+
+    reminders.load()
+    reminders.start()
+    events.start()
+    archive_job.start()
     
-    # Verify frontend files
-    if FRONTEND_DIR.exists() and (FRONTEND_DIR / "index.html").exists():
-        logger.info(f"Frontend files verified at {FRONTEND_DIR}")
+    # Index the frontend build once; requests are then served from memory
+    static_assets.load()
+    if static_assets.index is not None:
+        logger.info("Frontend files verified at %s", FRONTEND_DIR)
     else:
-        logger.warning(f"Frontend files not found at {FRONTEND_DIR}")
+        logger.warning("Frontend files not found at %s", FRONTEND_DIR)
     
     logger.info("Application startup completed successfully")
 
@@ -148,32 +370,49 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Application shutting down")
+    await reminders.stop()
+    archive_job.stop()
+    read_executor.shutdown(wait=True)
+    # Give queued emails a chance to go out
+    emailer.shutdown()
+    repository.stop()
+    stop_logging()
 
 # ---------------- HELPERS ---------------- #
 
 def read_json(file, default):
     try:
         if not file.exists():
-            logger.debug(f"File not found, returning default: {file.name}")
+            logger.debug("File not found, returning default: %s", file.name)
             return default
+        started = time.perf_counter()
         with open(file, "r") as f:
             data = json.load(f)
-            logger.debug(f"Successfully read {file.name}")
+            record_io("read", file.name, f.tell(), time.perf_counter() - started)
+            logger.debug("Successfully read %s", file.name)
             return data
     except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error in {file.name}: {e}")
+        logger.error("JSON decode error in %s: %s", file.name, e)
         return default
     except Exception as e:
-        logger.error(f"Error reading {file.name}: {e}")
+        logger.error("Error reading %s: %s", file.name, e)
         return default
 
 def write_json(file, data):
     try:
-        with open(file, "w") as f:
+        # Write to a temp file and swap it in so a crash never leaves a truncated file
+        started = time.perf_counter()
+        tmp = file.with_name(f"{file.name}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
             json.dump(data, f, indent=2)
-        logger.debug(f"Successfully wrote to {file.name}")
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        os.replace(tmp, file)
+        record_io("write", file.name, size, time.perf_counter() - started)
+        logger.debug("Successfully wrote to %s", file.name)
     except Exception as e:
-        logger.error(f"Failed to write {file.name}: {e}")
+        logger.error("Failed to write %s: %s", file.name, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to save data"
@@ -182,33 +421,104 @@ def write_json(file, data):
 def now_ist():
     return datetime.now(IST)
 
+def require_batch_size(size):
+    if size > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_SIZE} items per batch"
+        )
+
+def idempotent(scope, key, data, response, handler, ttl=None, fresh=None):
+    """Run ``handler(data)`` once per Idempotency-Key; retries get the stored outcome.
+
+    Client errors (4xx) are outcomes too, so a retried booking that lost its
+    slot gets the same 409. Server errors are not kept and may be retried.
+    An outcome for which ``fresh`` returns False is dropped and the handler
+    runs again.
+    """
+    if key is None:
+        return handler(data)
+    if not 1 <= len(key) <= 255:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Idempotency-Key must be 1 to 255 characters"
+        )
+
+    def call():
+        try:
+            return handler(data)
+        except HTTPException as e:
+            if e.status_code >= 500:
+                raise
+            return e
+
+    try:
+        outcome, replayed = idempotency.run((scope, key), data.model_dump(), call, ttl=ttl, fresh=fresh)
+    except IdempotencyMismatch:
+        IDEMPOTENT_REQUESTS.inc(scope=scope, outcome="mismatch")
+        logger.warning("Idempotency-Key reused with a different %s request", scope)
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different request"
+        )
+    except IdempotencyInProgress:
+        IDEMPOTENT_REQUESTS.inc(scope=scope, outcome="in_progress")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still in progress"
+        )
+
+    IDEMPOTENT_REQUESTS.inc(scope=scope, outcome="replayed" if replayed else "executed")
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    if replayed:
+        logger.info("Replayed %s response for Idempotency-Key %s", scope, key)
+    if isinstance(outcome, HTTPException):
+        raise HTTPException(status_code=outcome.status_code, detail=outcome.detail, headers=headers)
+    if replayed:
+        response.headers.update(headers)
+    return outcome
+
 # ---------------- AUTH ENDPOINTS ---------------- #
 
 @app.post("/api/login")
-def login(data: LoginRequest):
+def login(data: LoginRequest, response: Response, idempotency_key: Optional[str] = Header(None)):
+    # A retried login gets the OTP it was already sent instead of a new one, while that OTP is valid
+    return idempotent(
+        "login", idempotency_key, data, response, issue_otp,
+        ttl=OTP_TTL_SECONDS, fresh=lambda outcome: otp_pending(data.email, outcome)
+    )
+
+def otp_pending(email, outcome):
+    """False once the OTP in a login outcome was used, locked out or replaced."""
+    if isinstance(outcome, HTTPException):
+        return True
+    record = OTP_STORE.get(email)
+    return record is not None and record["otp"] == outcome["otp"]
+
+def issue_otp(data):
     email = data.email
     username = data.username
     
-    logger.info(f"Login attempt for email: {email}")
+    logger.info("Login attempt for email: %s", email)
     
     if not email or not username:
-        logger.warning(f"Login failed: missing email or username")
+        logger.warning("Login failed: missing email or username")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Missing email or username"
         )
     
     try:
-        otp = str(random.randint(100000, 999999))
-        OTP_STORE[email] = {
+        otp = generate_otp()
+        OTP_STORE.put(email, {
             "otp": otp,
-            "expires_at": time.time() + 300,
+            "expires_at": time.time() + OTP_TTL_SECONDS,
             "username": username
-        }
-        logger.info(f"OTP generated for {email}")
+        })
+        logger.info("OTP generated for %s", email)
         return {"success": True, "otp": otp}
     except Exception as e:
-        logger.error(f"Login error for {email}: {e}", exc_info=True)
+        logger.error("Login error for %s: %s", email, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Login failed"
@@ -219,10 +529,10 @@ def verify_otp(data: VerifyOtpRequest):
     email = data.email
     otp = data.otp
     
-    logger.info(f"OTP verification attempt for email: {email}")
+    logger.info("OTP verification attempt for email: %s", email)
     
     if not email or not otp:
-        logger.warning(f"OTP verification failed: missing email or otp")
+        logger.warning("OTP verification failed: missing email or otp")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Missing email or otp"
@@ -231,28 +541,32 @@ def verify_otp(data: VerifyOtpRequest):
     try:
         record = OTP_STORE.get(email)
         if not record:
-            logger.warning(f"OTP verification failed for {email}: no OTP found")
+            logger.warning("OTP verification failed for %s: no OTP found", email)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No OTP found for this email"
             )
         
         if record["otp"] != otp:
-            logger.warning(f"OTP verification failed for {email}: incorrect OTP")
+            logger.warning("OTP verification failed for %s: incorrect OTP", email)
+            if OTP_STORE.fail(email) >= OTP_MAX_ATTEMPTS:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many failed attempts, request a new OTP"
+                )
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid OTP"
             )
         
         if time.time() > record["expires_at"]:
-            logger.warning(f"OTP verification failed for {email}: OTP expired")
+            logger.warning("OTP verification failed for %s: OTP expired", email)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="OTP expired"
             )
 
-        users = read_json(USERS_FILE, [])
-        user = next((u for u in users if u["email"] == email), None)
+        user = repository.get_user(email)
 
         now = now_ist().isoformat()
 
@@ -264,21 +578,20 @@ def verify_otp(data: VerifyOtpRequest):
                 "created_at": now,
                 "last_login": now
             }
-            users.append(user)
-            logger.info(f"New user created: {email}")
+            logger.info("New user created: %s", email)
         else:
-            user["last_login"] = now
-            logger.info(f"User login: {email}")
+            user = {**user, "last_login": now}
+            logger.info("User login: %s", email)
 
-        write_json(USERS_FILE, users)
-        OTP_STORE.pop(email, None)
+        repository.save_user(user)
+        OTP_STORE.pop(email)
 
-        logger.info(f"OTP verification successful for {email}")
+        logger.info("OTP verification successful for %s", email)
         return {"success": True, "user": user}
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"OTP verification error for {email}: {e}", exc_info=True)
+        logger.error("OTP verification error for %s: %s", email, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Verification failed"
@@ -286,60 +599,92 @@ def verify_otp(data: VerifyOtpRequest):
 
 # ---------------- SLOTS ENDPOINTS ---------------- #
 
+def parse_date(date):
+    try:
+        return datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        logger.warning("Invalid date format: %s", date)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid date format, expected YYYY-MM-DD"
+        )
+
+def require_slot_config():
+    if not availability.configured:
+        logger.error("Slot configuration missing from slots.json")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Slot configuration missing"
+        )
+
+def render_slots(date):
+    """(ETag, serialized body) of a date's slots as of now."""
+    # A day only changes when it gets a booking or now passes a slot start
+    now = now_ist()
+    version, first_bookable = availability.state(date, now)
+    etag = f'W/"{ETAG_INSTANCE}.{date}.{version}.{first_bookable}"'
+
+    key = (date, version, first_bookable)
+    body = slots_cache.get(key)
+    if body is None:
+        slots = availability.day(date, now)
+        body = dumps({"slots": slots})
+        slots_cache.put(key, body)
+        logger.info("Slots retrieved for %s: %s slots total", date, len(slots))
+    return etag, body
+
 @app.get("/api/slots")
-def get_slots(date: str):
-    logger.info(f"Slots requested for date: {date}")
+async def get_slots(date: str, request: Request):
+    logger.info("Slots requested for date: %s", date)
     
     try:
-        slots_data = read_json(SLOTS_FILE, {})
-        config = slots_data.get("working_hours")
-        if not config:
-            logger.error("Slot configuration missing from slots.json")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Slot configuration missing"
-            )
-        
-        start_h, start_m = map(int, config["start"].split(":"))
-        end_h, end_m = map(int, config["end"].split(":"))
-        interval = config["interval_minutes"]
+        require_slot_config()
+        date = parse_date(date).strftime("%Y-%m-%d")
 
-        bookings = read_json(BOOKINGS_FILE, [])
-        booked_starts = {b["slot_start"] for b in bookings if b["status"] == "ACTIVE"}
+        # With several workers this may reload the day from storage, so it runs off the event loop
+        etag, body = await reads.do(("slots", date), render_slots, date)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
 
-        try:
-            selected = IST.localize(datetime.strptime(date, "%Y-%m-%d"))
-        except ValueError as e:
-            logger.warning(f"Invalid date format: {date}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid date format, expected YYYY-MM-DD"
-            )
-        
-        current = selected.replace(hour=start_h, minute=start_m, second=0)
-        end = selected.replace(hour=end_h, minute=end_m, second=0)
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        return Response(content=body, media_type="application/json", headers=headers)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error fetching slots for %s: %s", date, e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch slots"
+        )
+
+@app.get("/api/slots/range")
+def get_slots_range(start: str = Query(..., alias="from"), days: int = 7):
+    logger.info("Slots requested for %s days from %s", days, start)
 
-        slots = []
-        while current < end:
-            next_time = current + timedelta(minutes=interval)
-            start_iso = current.isoformat()
+    if not 1 <= days <= MAX_SLOT_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"days must be between 1 and {MAX_SLOT_RANGE_DAYS}"
+        )
+
+    try:
+        require_slot_config()
+        first = parse_date(start)
 
-            slots.append({
-                "start": current.strftime("%I:%M %p"),
-                "end": next_time.strftime("%I:%M %p"),
-                "is_bookable": current > now_ist() and start_iso not in booked_starts,
-                "is_booked": start_iso in booked_starts
-            })
+        now = now_ist()
+        result = []
+        for offset in range(days):
+            date = (first + timedelta(days=offset)).strftime("%Y-%m-%d")
+            result.append({"date": date, "slots": availability.day(date, now)})
 
-            current = next_time
+        return {"days": result}
 
-        logger.info(f"Slots retrieved for {date}: {len(slots)} slots total")
-        return {"slots": slots}
-    
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error fetching slots for {date}: {e}", exc_info=True)
+        logger.error("Error fetching slots from %s: %s", start, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch slots"
@@ -347,64 +692,84 @@ def get_slots(date: str):
 
 # ---------------- BOOKINGS ENDPOINTS ---------------- #
 
+def parse_slot(slot):
+    """Parse 'YYYY-MM-DD HH:MM AM-HH:MM AM' into IST start and end datetimes."""
+    try:
+        date_part, time_part = slot.split(" ", 1)
+        start_str, end_str = [s.strip() for s in time_part.split("-")]
+    except Exception:
+        logger.warning("Booking failed: invalid slot format: %s", slot)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid slot format, expected 'YYYY-MM-DD HH:MM AM/PM-HH:MM AM/PM'"
+        )
+
+    try:
+        start_dt = IST.localize(datetime.strptime(
+            f"{date_part} {start_str}", "%Y-%m-%d %I:%M %p"
+        ))
+        end_dt = IST.localize(datetime.strptime(
+            f"{date_part} {end_str}", "%Y-%m-%d %I:%M %p"
+        ))
+    except Exception:
+        logger.warning("Booking failed: invalid date/time format in slot: %s", slot)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid date/time in slot"
+        )
+    return start_dt, end_dt
+
+def bookable_seats(start_dt):
+    """Counter of each seat in the slot starting at ``start_dt``; rejects past and off-schedule slots."""
+    if start_dt <= now_ist():
+        logger.warning("Booking failed: attempting to book past slot %s", start_dt.isoformat())
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot book past slot"
+        )
+
+    require_slot_config()
+    seats = availability.schedule.seats(start_dt.isoformat())
+    if not seats:
+        logger.warning("Booking failed: slot not on the schedule: %s", start_dt.isoformat())
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Slot is not on the schedule"
+        )
+    return seats
+
 @app.post("/api/book")
-def book_slot(data: BookSlotRequest):
+def book_slot(data: BookSlotRequest, response: Response, idempotency_key: Optional[str] = Header(None)):
+    return idempotent("book", idempotency_key, data, response, reserve_slot)
+
+def reserve_slot(data):
     email = data.email
     slot = data.slot
     
-    logger.info(f"Booking request from {email} for slot: {slot}")
+    logger.info("Booking request from %s for slot: %s", email, slot)
     
     if not email or not slot:
-        logger.warning(f"Booking failed: missing email or slot")
+        logger.warning("Booking failed: missing email or slot")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Missing email or slot"
         )
 
     try:
-        bookings = read_json(BOOKINGS_FILE, [])
-
+        # Cheap pre-checks; the booking engine re-checks both under its locks
         # Check for one active booking per user
-        if any(b for b in bookings if b["email"] == email and b["status"] == "ACTIVE"):
-            logger.warning(f"Booking failed for {email}: already has active booking")
+        if repository.get_active_booking(email):
+            logger.warning("Booking failed for %s: already has active booking", email)
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="User already has an active booking"
             )
 
-        try:
-            date_part, time_part = slot.split(" ", 1)
-            start_str, end_str = [s.strip() for s in time_part.split("-")]
-        except Exception:
-            logger.warning(f"Booking failed: invalid slot format: {slot}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid slot format, expected 'YYYY-MM-DD HH:MM AM/PM-HH:MM AM/PM'"
-            )
-
-        try:
-            start_dt = IST.localize(datetime.strptime(
-                f"{date_part} {start_str}", "%Y-%m-%d %I:%M %p"
-            ))
-            end_dt = IST.localize(datetime.strptime(
-                f"{date_part} {end_str}", "%Y-%m-%d %I:%M %p"
-            ))
-        except Exception:
-            logger.warning(f"Booking failed: invalid date/time format in slot: {slot}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid date/time in slot"
-            )
-
-        if start_dt <= now_ist():
-            logger.warning(f"Booking failed for {email}: attempting to book past slot")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Cannot book past slot"
-            )
+        start_dt, end_dt = parse_slot(slot)
+        seats = bookable_seats(start_dt)
 
-        if any(b for b in bookings if b["slot_start"] == start_dt.isoformat()):
-            logger.warning(f"Booking failed: slot already booked: {start_dt.isoformat()}")
+        if not availability.has_room(start_dt.isoformat()):
+            logger.warning("Booking failed: slot already booked: %s", start_dt.isoformat())
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Slot already booked"
@@ -418,37 +783,82 @@ def book_slot(data: BookSlotRequest):
             "status": "ACTIVE"
         }
 
-        bookings.append(booking)
-        write_json(BOOKINGS_FILE, bookings)
-
-        notifications = read_json(NOTIFICATIONS_FILE, [])
-        notifications.append({
+        notification = {
             "id": str(uuid.uuid4()),
             "email": email,
-            "message": f"Booking confirmed for {start_str}",
+            "message": f"Booking confirmed for {start_dt.strftime('%I:%M %p')}",
             "type": "CONFIRMATION",
             "created_at": now_ist().isoformat(),
             "cleared": False
-        })
-        write_json(NOTIFICATIONS_FILE, notifications)
+        }
+
+        try:
+            booking = booking_engine.reserve(booking, notification, seats)
+        except BookingConflict as e:
+            logger.warning("Booking failed for %s: %s", email, e)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=str(e)
+            )
+        publish_notification(notification)
 
-        logger.info(f"Booking successful for {email}: {booking['id']}")
+        logger.info("Booking successful for %s: %s", email, booking["id"])
         return {"success": True, "message": "Booked successfully", "booking": booking}
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Booking error for {email}: {e}", exc_info=True)
+        logger.error("Booking error for %s: %s", email, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to book slot"
         )
 
+# ---------------- QUEUE ENDPOINTS ---------------- #
+
+@app.get("/api/queue")
+def get_queue_position(email: str):
+    logger.info("Queue position requested for %s", email)
+
+    try:
+        require_slot_config()
+        booking = repository.get_active_booking(email)
+        if not booking:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No active booking"
+            )
+
+        # Bookings whose slot has already ended have been served
+        now = now_ist()
+        served_before = (now - timedelta(minutes=availability.interval)).replace(microsecond=0).isoformat()
+        ahead = queue_index.ahead_of(booking["slot_start"], served_before)
+        # Counters serve in parallel, so the queue drains one slot's capacity per interval
+        capacity = len(availability.schedule.seats(booking["slot_start"])) or 1
+
+        return {
+            "slot_start": booking["slot_start"],
+            "slot_end": booking["slot_end"],
+            "counter": booking.get("counter"),
+            "position": ahead + 1,
+            "ahead": ahead,
+            "estimated_wait_minutes": -(-ahead // capacity) * availability.interval
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error fetching queue position for %s: %s", email, e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch queue position"
+        )
+
 # ---------------- NOTIFICATIONS ENDPOINTS ---------------- #
 
 @app.get("/api/notifications")
-def get_notifications(email: str):
-    logger.info(f"Notifications requested for {email}")
+async def get_notifications(email: str, since: Optional[int] = None, limit: Optional[int] = None):
+    logger.info("Notifications requested for %s", email)
     
     try:
         if not email:
@@ -457,61 +867,60 @@ def get_notifications(email: str):
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email required"
             )
-        
-        bookings = read_json(BOOKINGS_FILE, [])
-        notifications = read_json(NOTIFICATIONS_FILE, [])
 
-        # Generate reminders for active bookings within 10 minutes
-        for b in bookings:
-            if b["email"] != email or b["status"] != "ACTIVE":
-                continue
-
-            try:
-                start = datetime.fromisoformat(b["slot_start"])
-            except Exception as e:
-                logger.warning(f"Failed to parse slot time for booking {b.get('id')}: {e}")
-                continue
-
-            time_until = (start - now_ist()).total_seconds()
-            if 0 <= time_until <= 600:  # Within 10 minutes
-                # Check if reminder already exists
-                if not any(
-                    n for n in notifications
-                    if n["email"] == email and n["type"] == "REMINDER" and not n["cleared"]
-                ):
-                    reminder = {
-                        "id": str(uuid.uuid4()),
-                        "email": email,
-                        "message": "Your appointment is in 10 minutes",
-                        "type": "REMINDER",
-                        "created_at": now_ist().isoformat(),
-                        "cleared": False
-                    }
-                    notifications.append(reminder)
-                    logger.info(f"Reminder created for {email}")
-
-        write_json(NOTIFICATIONS_FILE, notifications)
-
-        user_notifications = [
-            n for n in notifications
-            if n["email"] == email and not n["cleared"]
-        ]
+        if since is not None or limit is not None:
+            since, limit = page_bounds(since or 0, limit)
+            return await reads.do(("notifications", email, since, limit), notifications_page, email, since, limit)
         
-        logger.info(f"Retrieved {len(user_notifications)} notifications for {email}")
+        # Reminders are written by the background scheduler, so this is a pure read
+        user_notifications = await reads.do(("notifications", email), repository.pending_notifications, email)
+
+        logger.info("Retrieved %s notifications for %s", len(user_notifications), email)
         return user_notifications
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error fetching notifications for {email}: {e}", exc_info=True)
+        logger.error("Error fetching notifications for %s: %s", email, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch notifications"
         )
 
+def page_bounds(since, limit):
+    if since < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="since must not be negative"
+        )
+    if limit is None:
+        limit = NOTIFICATIONS_PAGE_SIZE
+    if not 1 <= limit <= MAX_NOTIFICATIONS_PAGE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {MAX_NOTIFICATIONS_PAGE_SIZE}"
+        )
+    return since, limit
+
+def notifications_page(email, since, limit):
+    """Pending notifications newer than the ``since`` cursor, oldest first."""
+    # One extra row tells whether another page follows
+    page = repository.pending_notifications(email, since=since, limit=limit + 1)
+    has_more = len(page) > limit
+    page = page[:limit]
+    # An empty delta leaves the cursor where it was
+    cursor = page[-1]["seq"] if page else since
+
+    logger.info("Retrieved %s notifications for %s after %s", len(page), email, since)
+    return {"notifications": page, "cursor": cursor, "has_more": has_more}
+
 @app.post("/api/notifications/clear")
-def clear_notification(notification_id: str):
-    logger.info(f"Clear notification request for: {notification_id}")
+def clear_notification(notification_id: str = None, data: Optional[ClearNotificationsRequest] = None):
+    # A JSON body clears a list of ids, or every pending notification of an email, in one write
+    if not notification_id and data is not None:
+        return clear_notifications(data)
+
+    logger.info("Clear notification request for: %s", notification_id)
     
     if not notification_id:
         logger.warning("Clear notification without notification_id")
@@ -521,35 +930,282 @@ def clear_notification(notification_id: str):
         )
     
     try:
-        notifications = read_json(NOTIFICATIONS_FILE, [])
-        found = False
-        
-        for n in notifications:
-            if n["id"] == notification_id:
-                n["cleared"] = True
-                found = True
-                logger.info(f"Notification cleared: {notification_id}")
-                break
-        
-        if not found:
-            logger.warning(f"Notification not found: {notification_id}")
+        if not repository.clear_notification(notification_id):
+            logger.warning("Notification not found: %s", notification_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Notification not found"
             )
-        
-        write_json(NOTIFICATIONS_FILE, notifications)
+
+        logger.info("Notification cleared: %s", notification_id)
         return {"success": True}
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error clearing notification {notification_id}: {e}", exc_info=True)
+        logger.error("Error clearing notification %s: %s", notification_id, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to clear notification"
         )
 
+def clear_notifications(data):
+    if data.all:
+        if not data.email:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email required to clear all notifications"
+            )
+    elif not data.ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Notification IDs required"
+        )
+    require_batch_size(len(data.ids))
+
+    try:
+        if data.all:
+            cleared = repository.clear_all_notifications(data.email)
+            results = [{"id": notification_id, "success": True} for notification_id in cleared]
+            logger.info("Cleared all %s notifications for %s", len(cleared), data.email)
+        else:
+            found = repository.clear_notifications(data.ids)
+            results = [
+                {"id": notification_id, "success": True} if found[notification_id]
+                else {"id": notification_id, "success": False, "error": "Notification not found"}
+                for notification_id in data.ids
+            ]
+            logger.info("Cleared %s of %s notifications", sum(found.values()), len(found))
+
+        return {
+            "success": True,
+            "cleared": sum(1 for r in results if r["success"]),
+            "results": results
+        }
+
+    except Exception as e:
+        logger.error("Error clearing notifications: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to clear notifications"
+        )
+
+# ---------------- HISTORY ENDPOINTS ---------------- #
+
+def parse_month(month):
+    try:
+        if len(month) != 7:
+            raise ValueError(month)
+        datetime.strptime(month, "%Y-%m")
+    except ValueError:
+        logger.warning("Invalid month format: %s", month)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid month format. Use YYYY-MM"
+        )
+    return month
+
+@app.get("/api/history")
+def get_history(email: str, start: str = Query(None, alias="from"), end: str = Query(None, alias="to")):
+    logger.info("History requested for %s", email)
+
+    if not email:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email required"
+        )
+    if start:
+        parse_month(start)
+    if end:
+        parse_month(end)
+
+    try:
+        # Archived records only: past-day bookings and cleared notifications
+        return repository.history(email, start, end)
+    except Exception as e:
+        logger.error("Error fetching history for %s: %s", email, e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch history"
+        )
+
+# ---------------- EVENTS ENDPOINTS ---------------- #
+
+@app.get("/api/events")
+async def stream_events(request: Request, email: str = None, date: str = None):
+    topics = []
+    if email:
+        topics.append(f"email:{email}")
+    if date:
+        topics.append(f"date:{parse_date(date).strftime('%Y-%m-%d')}")
+    if not topics:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="email or date required"
+        )
+
+    logger.info("Event stream opened for %s", ", ".join(topics))
+    subscriber = events.subscribe(topics)
+    return StreamingResponse(
+        events.stream(subscriber, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ---------------- OBSERVABILITY ENDPOINTS ---------------- #
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+profiler = SamplingProfiler()
+
+def require_admin(request: Request):
+    # Admin endpoints stay disabled unless ADMIN_TOKEN is configured
+    token = request.headers.get("x-admin-token", "")
+    # Constant-time comparison, so response timing does not leak how much of the token matched
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+# On the SQLite backend these are COUNT(*) queries, so scrapes share a recent result
+METRICS_COUNT_MAX_AGE = float(os.getenv("METRICS_COUNT_MAX_AGE", "15"))
+REGISTRY.gauge(
+    "serveq_otp_store_size", "Pending OTP records", lambda: len(OTP_STORE), max_age=METRICS_COUNT_MAX_AGE
+)
+REGISTRY.gauge(
+    "serveq_records", "Stored records by kind",
+    lambda: {(("kind", kind),): count for kind, count in repository.counts().items()},
+    max_age=METRICS_COUNT_MAX_AGE
+)
+REGISTRY.gauge("serveq_event_subscribers", "Open event stream subscribers", lambda: events.subscriber_count())
+REGISTRY.gauge("serveq_slots_cache_entries", "Cached /api/slots bodies", lambda: len(slots_cache))
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/admin/profiler")
+def get_profiler(request: Request):
+    require_admin(request)
+    return profiler.top()
+
+@app.post("/api/admin/profiler")
+def set_profiler(data: ProfilerRequest, request: Request):
+    require_admin(request)
+    if data.reset:
+        profiler.reset()
+    if data.enabled:
+        profiler.start(interval=data.interval_ms / 1000)
+        logger.info("Sampling profiler started (%s ms)", data.interval_ms)
+    else:
+        profiler.stop()
+        logger.info("Sampling profiler stopped")
+    return {"success": True, "running": profiler.running}
+
+# ---------------- ADMIN ENDPOINTS ---------------- #
+
+@app.post("/api/admin/bookings/import")
+def import_bookings(data: BulkImportRequest, request: Request):
+    require_admin(request)
+    require_batch_size(len(data.bookings))
+    logger.info("Bulk import of %s bookings", len(data.bookings))
+
+    results = [None] * len(data.bookings)
+    pending = []
+    for i, item in enumerate(data.bookings):
+        try:
+            if not item.email or not item.slot:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Missing email or slot"
+                )
+            start_dt, end_dt = parse_slot(item.slot)
+            seats = bookable_seats(start_dt)
+        except HTTPException as e:
+            results[i] = {"index": i, "success": False, "error": e.detail}
+            continue
+        booking = {
+            "id": str(uuid.uuid4()),
+            "email": item.email,
+            "slot_start": start_dt.isoformat(),
+            "slot_end": end_dt.isoformat(),
+            "status": "ACTIVE"
+        }
+        pending.append((i, booking, seats))
+
+    try:
+        reserved = booking_engine.reserve_many([(booking, seats) for _, booking, seats in pending])
+    except Exception as e:
+        logger.error("Bulk import failed: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to import bookings"
+        )
+
+    for (i, _, _), (booking, error) in zip(pending, reserved):
+        if booking is not None:
+            results[i] = {"index": i, "success": True, "booking": booking}
+        else:
+            results[i] = {"index": i, "success": False, "error": error}
+
+    imported = sum(1 for r in results if r["success"])
+    logger.info("Bulk import stored %s of %s bookings", imported, len(results))
+    return {"success": True, "imported": imported, "results": results}
+
+@app.post("/api/admin/bookings/cancel")
+def cancel_bookings(data: BulkCancelRequest, request: Request):
+    require_admin(request)
+    require_batch_size(len(data.ids))
+    logger.info("Bulk cancel of %s bookings", len(data.ids))
+
+    try:
+        cancelled = booking_engine.cancel(data.ids)
+    except Exception as e:
+        logger.error("Bulk cancel failed: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to cancel bookings"
+        )
+
+    results = [
+        {"id": booking_id, "success": True} if cancelled[booking_id] is not None
+        else {"id": booking_id, "success": False, "error": "Booking not found or not active"}
+        for booking_id in data.ids
+    ]
+    return {
+        "success": True,
+        "cancelled": sum(1 for booking in cancelled.values() if booking is not None),
+        "results": results
+    }
+
+@app.get("/api/admin/stats")
+def get_stats(request: Request, start: str = Query(None, alias="from"), end: str = Query(None, alias="to")):
+    require_admin(request)
+
+    # Defaults to the 30 days up to today
+    last = parse_date(end) if end else now_ist().replace(tzinfo=None)
+    first = parse_date(start) if start else last - timedelta(days=29)
+    if not 0 <= (last - first).days < MAX_STATS_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"from must not be after to, and the range is limited to {MAX_STATS_RANGE_DAYS} days"
+        )
+
+    try:
+        report = stats.report(
+            first.strftime("%Y-%m-%d"),
+            last.strftime("%Y-%m-%d"),
+            availability.schedule if availability.configured else None
+        )
+        report["notifications"] = {"pending": repository.pending_count()}
+        return report
+    except Exception as e:
+        logger.error("Error building stats: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to build stats"
+        )
+
 # ---------------- SPA ROUTES (serve frontend) ---------------- #
 
 # Health check endpoint for Render
@@ -558,33 +1214,48 @@ def health_check():
     """Return basic health status and check critical files."""
     try:
         data_files = {f.name: f.exists() for f in [USERS_FILE, BOOKINGS_FILE, NOTIFICATIONS_FILE, SLOTS_FILE]}
-        static_ok = FRONTEND_DIR.exists() and (FRONTEND_DIR / "index.html").exists()
+        static_ok = static_assets.index is not None
         return {
             "success": True,
             "uptime": True,
             "data_files": data_files,
-            "static": static_ok
+            "static": static_ok,
+            "otp_store": OTP_STORE.stats(),
+            # Tells workers apart when WEB_CONCURRENCY > 1
+            "worker": os.getpid()
         }
     except Exception as e:
-        logger.error(f"Health check failed: {e}", exc_info=True)
+        logger.error("Health check failed: %s", e, exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Health check failed")
 
+def asset_response(asset, request: Request):
+    headers = {"ETag": asset.etag, "Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == asset.etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if asset.body is None:
+        # Too large to hold in memory; stream it from disk
+        return FileResponse(asset.file, media_type=asset.media_type, headers=headers)
+
+    body, encoding = static_assets.select(asset, request.headers.get("accept-encoding", ""))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=asset.media_type, headers=headers)
+
 # Serve the main SPA entry point
 @app.get("/", tags=["SPA"], include_in_schema=False)
-def serve_index():
-    index_file = FRONTEND_DIR / "index.html"
-    if index_file.exists():
-        logger.debug("Serving index.html from root")
-        return FileResponse(index_file, media_type="text/html")
-    logger.error(f"index.html not found at {index_file}")
+async def serve_index(request: Request):
+    if static_assets.index is not None:
+        return asset_response(static_assets.index, request)
+    logger.error("index.html not found at %s", FRONTEND_DIR)
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
         detail="Frontend not available"
     )
 
-# Catch-all for SPA routing - serve files or index.html
+# Catch-all for SPA routing - serve files or index.html from the in-memory manifest
 @app.get("/{path:path}", tags=["SPA"], include_in_schema=False)
-def serve_spa(path: str):
+async def serve_spa(path: str, request: Request):
     # Skip API routes - let them be handled by FastAPI
     if path.startswith("api/"):
         raise HTTPException(
@@ -592,20 +1263,16 @@ def serve_spa(path: str):
             detail="Not found"
         )
     
-    file_path = FRONTEND_DIR / path
-    
-    # If the requested file exists, serve it
-    if file_path.exists() and file_path.is_file():
-        logger.debug(f"Serving file: {path}")
-        return FileResponse(file_path)
+    # If the requested file is in the build, serve it
+    asset = static_assets.get(path)
+    if asset is not None:
+        return asset_response(asset, request)
     
     # Otherwise, serve index.html for SPA routing
-    index_file = FRONTEND_DIR / "index.html"
-    if index_file.exists():
-        logger.debug(f"SPA route not found ({path}), serving index.html")
-        return FileResponse(index_file, media_type="text/html")
+    if static_assets.index is not None:
+        return asset_response(static_assets.index, request)
     
-    logger.error(f"Neither file {path} nor index.html found")
+    logger.error("Neither file %s nor index.html found", path)
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
         detail="Resource not found"
@@ -0,0 +1,380 @@
+"""Load benchmark for the ServeQ API.
+
+Seeds a throwaway data directory per dataset size, then drives the login ->
+verify-otp -> slots -> book -> notifications flow either in-process through
+the ASGI app or over HTTP against a local uvicorn, and records throughput and
+p50/p95/p99 latency per endpoint. Per-IP/per-email rate limits are switched
+off for these runs, since every virtual user shares one address, and so is
+the archive job, which would otherwise archive the past-dated seed data.
+
+``--mode burst`` instead starts all users at once, each from its own IP,
+with admission control at its defaults, while ``/health`` is probed
+throughout. Latencies cover admitted requests only; 429/503 rejections are
+counted separately.
+
+    cd backend
+    python -m benchmarks.api_bench --sizes 1000,100000 --users 500 --mode asgi,uvicorn
+    python -m benchmarks.api_bench --sizes 1000 --users 2000 --mode burst
+
+Each size runs in its own subprocess because app.py binds its data directory
+and storage at import time. Results are written as JSON (``--output``) so runs
+from different commits can be compared.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SLOTS_PER_DAY = 16
+WORKING_HOURS = {"working_hours": {"start": "09:00", "end": "17:00", "interval_minutes": 30}}
+# The seeded bookings are dated from 2000, so the archive job would move them all out at startup
+SERVER_ENV = {"PYTHONPATH": str(BACKEND_DIR), "ARCHIVE_INTERVAL": "0"}
+
+
+# ---------------- DATASET ---------------- #
+
+def slot_times(index):
+    start = datetime(2000, 1, 1, 9, 0) + timedelta(minutes=30 * index)
+    return start, start + timedelta(minutes=30)
+
+
+def seed(data_dir, size):
+    """Write users/bookings/notifications with ``size`` past bookings and notifications."""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    created = "2000-01-01T00:00:00+05:30"
+    users, bookings, notifications = [], [], []
+
+    for i in range(size):
+        email = f"seed{i}@bench.local"
+        day = date(2000, 1, 1) + timedelta(days=i // SLOTS_PER_DAY)
+        start, end = slot_times(i % SLOTS_PER_DAY)
+        slot_start = f"{day}T{start:%H:%M}:00+05:30"
+        slot_end = f"{day}T{end:%H:%M}:00+05:30"
+
+        users.append({"id": str(uuid.uuid4()), "email": email, "username": "seed",
+                      "created_at": created, "last_login": created})
+        bookings.append({"id": str(uuid.uuid4()), "email": email, "slot_start": slot_start,
+                         "slot_end": slot_end, "status": "ACTIVE"})
+        notifications.append({"id": str(uuid.uuid4()), "email": email,
+                              "message": f"Booking confirmed for {start:%I:%M %p}",
+                              "type": "CONFIRMATION", "created_at": created, "cleared": i % 2 == 0})
+
+    for name, data in (("users.json", users), ("bookings.json", bookings),
+                       ("notifications.json", notifications), ("slots.json", WORKING_HOURS)):
+        with open(data_dir / name, "w") as f:
+            json.dump(data, f)
+
+
+def flow_requests(user):
+    """The requests one virtual user makes, in order, as (endpoint, method, path, body)."""
+    email = f"bench{user}-{uuid.uuid4().hex[:6]}@bench.local"
+    day = date.today() + timedelta(days=1 + user // SLOTS_PER_DAY)
+    start, end = slot_times(user % SLOTS_PER_DAY)
+    slot = f"{day} {start:%I:%M %p}-{end:%I:%M %p}"
+    return email, [
+        ("login", "POST", "/api/login", {"email": email, "username": "bench"}),
+        ("verify-otp", "POST", "/api/verify-otp", {"email": email, "otp": None}),
+        ("slots", "GET", f"/api/slots?date={day}", None),
+        ("book", "POST", "/api/book", {"email": email, "slot": slot}),
+        ("notifications", "GET", f"/api/notifications?email={email}", None),
+    ]
+
+
+def summarize(samples, elapsed):
+    results = {}
+    for endpoint, latencies in samples.items():
+        latencies.sort()
+        count = len(latencies)
+
+        def pct(p):
+            return round(latencies[min(int(p * count), count - 1)] * 1000, 3)
+
+        results[endpoint] = {
+            "requests": count,
+            "throughput_rps": round(count / elapsed, 1),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+        }
+    return results
+
+
+# ---------------- IN-PROCESS (ASGI) ---------------- #
+
+async def asgi_call(app, method, path, body=None, client="127.0.0.1"):
+    path, _, query = path.partition("?")
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query.encode(), "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"host", b"bench")],
+        "client": (client, 0), "server": ("bench", 80),
+    }
+    sent = False
+    response = {"status": None, "body": b""}
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], response["body"]
+
+
+async def lifespan(app, event):
+    queue = asyncio.Queue()
+    await queue.put({"type": f"lifespan.{event}"})
+    done = asyncio.Event()
+
+    async def receive():
+        if done.is_set():
+            await asyncio.sleep(3600)
+        return await queue.get()
+
+    async def send(message):
+        done.set()
+
+    task = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}}, receive, send))
+    await done.wait()
+    return task
+
+
+async def run_asgi(users, concurrency):
+    import app as serveq
+
+    startup = await lifespan(serveq.app, "startup")
+    samples = {}
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_user(user):
+        nonlocal errors
+        async with semaphore:
+            _, steps = flow_requests(user)
+            otp = None
+            for endpoint, method, path, body in steps:
+                if endpoint == "verify-otp":
+                    body = {**body, "otp": otp}
+                started = time.perf_counter()
+                status, content = await asgi_call(serveq.app, method, path, body)
+                samples.setdefault(endpoint, []).append(time.perf_counter() - started)
+                if status >= 400:
+                    errors += 1
+                if endpoint == "login":
+                    otp = json.loads(content).get("otp")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_user(u) for u in range(users)))
+    elapsed = time.perf_counter() - started
+
+    startup.cancel()
+    await serveq.shutdown_event()
+    return summarize(samples, elapsed), errors
+
+
+async def run_burst(users):
+    import app as serveq
+
+    startup = await lifespan(serveq.app, "startup")
+    samples = {}
+    rejected = {}
+    errors = 0
+    stop = asyncio.Event()
+
+    async def one_user(user):
+        nonlocal errors
+        _, steps = flow_requests(user)
+        client = f"10.{user // 65536 % 256}.{user // 256 % 256}.{user % 256}"
+        otp = None
+        for endpoint, method, path, body in steps:
+            if endpoint == "verify-otp":
+                body = {**body, "otp": otp}
+            started = time.perf_counter()
+            status, content = await asgi_call(serveq.app, method, path, body, client)
+            elapsed = time.perf_counter() - started
+            if status in (429, 503):
+                key = f"{endpoint}:{status}"
+                rejected[key] = rejected.get(key, 0) + 1
+                return
+            samples.setdefault(endpoint, []).append(elapsed)
+            if status >= 400:
+                errors += 1
+            if endpoint == "login":
+                otp = json.loads(content).get("otp")
+
+    async def probe_health():
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asgi_call(serveq.app, "GET", "/health")
+            samples.setdefault("health", []).append(time.perf_counter() - started)
+            await asyncio.sleep(0.01)
+
+    prober = asyncio.create_task(probe_health())
+    started = time.perf_counter()
+    await asyncio.gather(*(one_user(u) for u in range(users)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await prober
+
+    startup.cancel()
+    await serveq.shutdown_event()
+    return summarize(samples, elapsed), errors, rejected
+
+
+# ---------------- UVICORN (HTTP) ---------------- #
+
+def run_uvicorn(users, concurrency, port):
+    env = {**os.environ, **SERVER_ENV}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        for _ in range(100):
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                conn.request("GET", "/health")
+                conn.getresponse().read()
+                break
+            except OSError:
+                time.sleep(0.2)
+
+        samples = {}
+        errors = [0]
+        lock = threading.Lock()
+        local = threading.local()
+
+        def one_user(user):
+            conn = getattr(local, "conn", None)
+            if conn is None:
+                conn = local.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            _, steps = flow_requests(user)
+            otp = None
+            for endpoint, method, path, body in steps:
+                if endpoint == "verify-otp":
+                    body = {**body, "otp": otp}
+                payload = json.dumps(body) if body is not None else None
+                started = time.perf_counter()
+                conn.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                content = response.read()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    samples.setdefault(endpoint, []).append(elapsed)
+                    if response.status >= 400:
+                        errors[0] += 1
+                if endpoint == "login":
+                    otp = json.loads(content).get("otp")
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(one_user, range(users)))
+        elapsed = time.perf_counter() - started
+        return summarize(samples, elapsed), errors[0]
+    finally:
+        server.terminate()
+        server.wait()
+
+
+# ---------------- DRIVER ---------------- #
+
+def run_one(args):
+    """Subprocess entry point: benchmark one (mode, size) in the current directory."""
+    rejected = {}
+    if args.mode == "asgi":
+        results, errors = asyncio.run(run_asgi(args.users, args.concurrency))
+    elif args.mode == "burst":
+        results, errors, rejected = asyncio.run(run_burst(args.users))
+    else:
+        results, errors = run_uvicorn(args.users, args.concurrency, args.port)
+    print(json.dumps({"endpoints": results, "errors": errors, "rejected": rejected}))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000", help="comma-separated seeded booking counts")
+    parser.add_argument("--mode", default="asgi,uvicorn", help="comma-separated: asgi, uvicorn, burst")
+    parser.add_argument("--users", type=int, default=500, help="virtual users per run")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        run_one(args)
+        return
+
+    report = {"commit": git_commit(), "timestamp": datetime.now().isoformat(), "runs": []}
+    for size in (int(s) for s in args.sizes.split(",")):
+        workdir = Path(tempfile.mkdtemp(prefix=f"serveq-bench-{size}-"))
+        try:
+            print(f"Seeding {size} bookings...", file=sys.stderr)
+            for mode in args.mode.split(","):
+                if (workdir / "data").exists():
+                    shutil.rmtree(workdir / "data")
+                seed(workdir / "data", size)
+
+                print(f"Running {mode} with {size} bookings...", file=sys.stderr)
+                env = {**os.environ, **SERVER_ENV}
+                if mode != "burst":
+                    env.update(RATE_LIMIT_IP_PER_MINUTE="0", RATE_LIMIT_EMAIL_PER_MINUTE="0")
+                output = subprocess.check_output(
+                    [sys.executable, "-m", "benchmarks.api_bench", "--run-one", "--mode", mode,
+                     "--users", str(args.users), "--concurrency", str(args.concurrency),
+                     "--port", str(args.port)],
+                    cwd=workdir, env=env,
+                    stderr=subprocess.DEVNULL, text=True
+                )
+                result = json.loads(output.strip().splitlines()[-1])
+                report["runs"].append({"mode": mode, "size": size, **result})
+
+                for endpoint, stats in result["endpoints"].items():
+                    print(
+                        f"{mode:8} {size:>9} {endpoint:14} {stats['throughput_rps']:>9} rps  "
+                        f"p50 {stats['p50_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms",
+                        file=sys.stderr
+                    )
+                if result["rejected"]:
+                    print(f"{mode:8} {size:>9} rejected: {result['rejected']}", file=sys.stderr)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Encode/decode benchmark for the snapshot formats.
+
+Seeds the same synthetic records as ``api_bench`` and times encoding and
+decoding each data file in every snapshot format, against the stdlib
+``json`` with ``indent=2`` that snapshots were originally written with.
+
+    cd backend
+    python -m benchmarks.serialization_bench --sizes 10000,100000,1000000
+
+Formats whose package is missing (orjson, msgpack) are skipped.
+"""
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.api_bench import git_commit, seed
+from utils import serialization
+
+FILES = ("users.json", "bookings.json", "notifications.json")
+
+
+def codecs():
+    """(name, encode, decode) for every format available in this environment."""
+    yield "stdlib-pretty", lambda obj: json.dumps(obj, indent=2).encode(), json.loads
+    yield "stdlib-compact", lambda obj: json.dumps(obj, separators=(",", ":")).encode(), json.loads
+    if serialization.orjson is not None:
+        yield "orjson-pretty", lambda obj: serialization.encode(obj, "pretty"), serialization.decode
+        yield "orjson-compact", lambda obj: serialization.encode(obj, "compact"), serialization.decode
+    if serialization.msgpack is not None:
+        yield "msgpack", lambda obj: serialization.encode(obj, "msgpack"), serialization.decode
+
+
+def best_of(repeat, fn, arg):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(arg)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(size, repeat):
+    workdir = Path(tempfile.mkdtemp(prefix=f"serveq-serial-{size}-"))
+    try:
+        seed(workdir, size)
+        records = {name: json.loads((workdir / name).read_bytes()) for name in FILES}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {}
+    for codec, encode, decode in codecs():
+        totals = {"encode_ms": 0.0, "decode_ms": 0.0, "bytes": 0}
+        for name, data in records.items():
+            encode_seconds, raw = best_of(repeat, encode, data)
+            decode_seconds, decoded = best_of(repeat, decode, raw)
+            if decoded != data:
+                raise AssertionError(f"{codec} did not round-trip {name}")
+            totals["encode_ms"] += encode_seconds * 1000
+            totals["decode_ms"] += decode_seconds * 1000
+            totals["bytes"] += len(raw)
+        results[codec] = {key: round(value, 3) for key, value in totals.items()}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated seeded record counts")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the fastest is kept")
+    parser.add_argument("--output", default="serialization_results.json")
+    args = parser.parse_args()
+
+    report = {"commit": git_commit(), "timestamp": datetime.now().isoformat(), "runs": []}
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"Encoding {size} records per file...", file=sys.stderr)
+        results = run(size, args.repeat)
+        report["runs"].append({"size": size, "codecs": results})
+
+        baseline = results["stdlib-pretty"]
+        for codec, stats in results.items():
+            print(
+                f"{size:>9} {codec:15} encode {stats['encode_ms']:>10} ms  decode {stats['decode_ms']:>10} ms  "
+                f"{stats['bytes'] / baseline['bytes']:>6.1%} of pretty size  "
+                f"x{baseline['encode_ms'] / stats['encode_ms']:.1f} encode / "
+                f"x{baseline['decode_ms'] / stats['decode_ms']:.1f} decode",
+                file=sys.stderr
+            )
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
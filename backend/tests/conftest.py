@@ -0,0 +1,58 @@
+import importlib
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+WORKING_HOURS = {"working_hours": {"start": "09:00", "end": "17:00", "interval_minutes": 30}}
+
+# Background jobs and admission limits would only add noise to functional tests
+TEST_ENV = {
+    "LOG_LEVEL": "ERROR",
+    "ARCHIVE_INTERVAL": "0",
+    "RATE_LIMIT_IP_PER_MINUTE": "0",
+    "RATE_LIMIT_EMAIL_PER_MINUTE": "0",
+    "ADMISSION_CONCURRENCY": "0",
+}
+
+
+def seed_data_dir(root):
+    data_dir = root / "data"
+    data_dir.mkdir()
+    for name in ("users.json", "bookings.json", "notifications.json"):
+        (data_dir / name).write_text("[]")
+    (data_dir / "slots.json").write_text(json.dumps(WORKING_HOURS))
+    return data_dir
+
+
+@pytest.fixture
+def load_app(tmp_path, monkeypatch):
+    """Import a fresh ``app`` module against an empty data directory under ``tmp_path``.
+
+    app.py binds its data directory and storage backend at import time, so
+    every call re-imports it with the given environment, in a directory of its
+    own. ``files`` maps data file names to raw contents that replace the
+    seeded ones.
+    """
+    loaded = []
+
+    def load(files=None, **env):
+        root = tmp_path / f"app{len(loaded)}"
+        root.mkdir()
+        loaded.append(root)
+        data_dir = seed_data_dir(root)
+        for name, content in (files or {}).items():
+            (data_dir / name).write_bytes(content)
+        monkeypatch.chdir(root)
+        for key, value in {**TEST_ENV, **env}.items():
+            monkeypatch.setenv(key, value)
+        sys.modules.pop("app", None)
+        return importlib.import_module("app")
+
+    yield load
+    sys.modules.pop("app", None)
@@ -0,0 +1,21 @@
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({}, 403),
+    ({"X-Admin-Token": "wrong"}, 403),
+    ({"X-Admin-Token": "sëcret".encode()}, 403),
+    ({"X-Admin-Token": "secret"}, 200),
+])
+def test_admin_token(load_app, headers, expected):
+    app = load_app(ADMIN_TOKEN="secret")
+    with TestClient(app.app) as client:
+        assert client.get("/api/admin/profiler", headers=headers).status_code == expected
+
+
+def test_admin_disabled_without_token(load_app, monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    app = load_app()
+    with TestClient(app.app) as client:
+        assert client.get("/api/admin/profiler", headers={"X-Admin-Token": ""}).status_code == 403
@@ -0,0 +1,21 @@
+from fastapi.testclient import TestClient
+
+LIMITS = {
+    "RATE_LIMIT_IP_PER_MINUTE": "1",
+    "RATE_LIMIT_IP_BURST": "1",
+    "RATE_LIMIT_PROXY_HOPS": "1",
+}
+
+
+def login(client, n, forwarded):
+    body = {"email": f"user{n}@test.local", "username": "User"}
+    return client.post("/api/login", json=body, headers={"X-Forwarded-For": forwarded})
+
+
+def test_ip_bucket_keys_on_the_hop_added_by_the_proxy(load_app):
+    app = load_app(**LIMITS)
+    with TestClient(app.app) as client:
+        assert login(client, 1, "10.0.0.1, 203.0.113.7").status_code == 200
+        # A forged entry left of the proxy's does not buy a fresh bucket
+        assert login(client, 2, "10.0.0.2, 203.0.113.7").status_code == 429
+        assert login(client, 3, "10.0.0.1, 203.0.113.8").status_code == 200
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+REQUESTS = 400
+SLOT_LABELS = ["09:00 AM-09:30 AM", "09:30 AM-10:00 AM", "10:00 AM-10:30 AM", "10:30 AM-11:00 AM"]
+
+
+def slot(label):
+    day = (datetime.now() + timedelta(days=2)).strftime("%Y-%m-%d")
+    return f"{day} {label}"
+
+
+def book_concurrently(client, bodies):
+    with ThreadPoolExecutor(64) as pool:
+        return list(pool.map(lambda body: client.post("/api/book", json=body), bodies))
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_each_slot_is_booked_once(load_app, backend):
+    app = load_app(STORAGE_BACKEND=backend)
+    bodies = [{"email": f"user{i}@test.local", "slot": slot(SLOT_LABELS[i % 4])} for i in range(REQUESTS)]
+
+    with TestClient(app.app) as client:
+        responses = book_concurrently(client, bodies)
+
+        assert sorted(r.status_code for r in responses) == [200] * 4 + [409] * (REQUESTS - 4)
+        booked = [r.json()["booking"] for r in responses if r.status_code == 200]
+        assert len({b["slot_start"] for b in booked}) == 4
+
+        # Every successful booking was stored, and nothing else was
+        stored = app.repository.active_bookings()
+        assert sorted(b["id"] for b in stored) == sorted(b["id"] for b in booked)
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_one_active_booking_per_email(load_app, backend):
+    app = load_app(STORAGE_BACKEND=backend)
+    labels = [f"{h:02d}:{m:02d} {'AM' if h < 12 else 'PM'}" for h in range(9, 17) for m in (0, 30)]
+    slots = [slot(f"{labels[i]}-{labels[i + 1]}") for i in range(len(labels) - 1)]
+    bodies = [{"email": "same@test.local", "slot": slots[i % len(slots)]} for i in range(REQUESTS)]
+
+    with TestClient(app.app) as client:
+        responses = book_concurrently(client, bodies)
+
+        assert sorted(r.status_code for r in responses) == [200] + [409] * (REQUESTS - 1)
+        assert len(app.repository.active_bookings()) == 1
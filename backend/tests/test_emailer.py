@@ -0,0 +1,197 @@
+import smtplib
+import socketserver
+import threading
+import time
+from email.message import EmailMessage
+
+import pytest
+
+from utils.emailer import EMAILS, MailQueue
+from utils.metrics import REGISTRY
+
+
+class SmtpStandIn(socketserver.ThreadingTCPServer):
+    """Just enough of an SMTP server for smtplib: records every message it
+    accepts, hangs up on the next ``drop`` MAIL commands, and waits
+    ``connect_delay`` seconds before greeting (standing in for TLS and login)."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SmtpHandler)
+        self.messages = []
+        self.drop = 0
+        self.connect_delay = 0
+        self.lock = threading.Lock()
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        time.sleep(self.server.connect_delay)
+        self.reply("220 stand-in ready")
+        for raw in self.rfile:
+            command = raw.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 stand-in")
+            elif command.startswith("MAIL"):
+                with self.server.lock:
+                    if self.server.drop:
+                        self.server.drop -= 1
+                        return
+                self.reply("250 OK")
+            elif command.startswith("RCPT"):
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for line in self.rfile:
+                    if line == b".\r\n":
+                        break
+                    lines.append(line)
+                with self.server.lock:
+                    self.server.messages.append(b"".join(lines))
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+@pytest.fixture
+def smtp():
+    server = SmtpStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def mail_queue(smtp, **options):
+    mail = MailQueue("127.0.0.1", smtp.server_address[1], use_ssl=False, sender="serveq@test.local", **options)
+    mail.start()
+    return mail
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+def test_delivers_over_one_connection(smtp):
+    mail = mail_queue(smtp)
+    for n in range(20):
+        assert mail.send(f"user{n}@test.local", "Booking confirmed", "See you soon")
+    mail.stop()
+
+    assert len(smtp.messages) == 20
+    assert mail.metrics["sent"] == 20
+    assert mail.metrics["connections"] == 1
+    assert mail.stats()["pending"] == 0
+
+
+def test_pooled_throughput_beats_connection_per_message(smtp):
+    """Messages per second through MailQueue's pooled connection, against the
+    original one connection per email, both on the local stand-in."""
+    messages = 200
+    port = smtp.server_address[1]
+    smtp.connect_delay = 0.005
+
+    started = time.perf_counter()
+    for n in range(messages):
+        msg = EmailMessage()
+        msg["From"], msg["To"], msg["Subject"] = "serveq@test.local", f"user{n}@test.local", "Booking confirmed"
+        msg.set_content("See you soon")
+        with smtplib.SMTP("127.0.0.1", port) as server:
+            server.send_message(msg)
+    per_message = messages / (time.perf_counter() - started)
+
+    mail = mail_queue(smtp)
+    started = time.perf_counter()
+    for n in range(messages):
+        mail.send(f"user{n}@test.local", "Booking confirmed", "See you soon")
+    wait_for(lambda: mail.metrics["sent"] == messages, timeout=30)
+    pooled = messages / (time.perf_counter() - started)
+    mail.stop()
+
+    print(f"\nMailQueue: {pooled:.0f} msg/s pooled, {per_message:.0f} msg/s with one connection per message")
+    assert len(smtp.messages) == 2 * messages
+    assert mail.metrics["connections"] == 1
+    assert pooled > per_message
+
+
+def test_retries_with_backoff_after_disconnect(smtp):
+    mail = mail_queue(smtp, backoff=0.2)
+    mail.send("first@test.local", "Booking confirmed", "See you soon")
+    wait_for(lambda: mail.metrics["sent"] == 1)
+
+    # Drop both the stale connection and the immediate reconnect, forcing a backoff retry
+    smtp.drop = 2
+    failed_at = time.monotonic()
+    mail.send("second@test.local", "Booking confirmed", "See you soon")
+    wait_for(lambda: mail.metrics["sent"] == 2)
+    mail.stop()
+
+    assert time.monotonic() - failed_at >= 0.2
+    assert len(smtp.messages) == 2
+    assert mail.metrics["retried"] == 1
+    assert mail.metrics["failed"] == 0
+    assert mail.metrics["connections"] == 3
+
+
+def test_stop_counts_pending_retries_as_failed(smtp):
+    mail = mail_queue(smtp, backoff=60.0)
+    smtp.drop = 2
+    mail.send("user@test.local", "Booking confirmed", "See you soon")
+    wait_for(lambda: mail.metrics["retried"] == 1)
+    mail.stop()
+
+    assert smtp.messages == []
+    assert mail.metrics["failed"] == 1
+    assert mail.stats()["pending"] == 0
+
+
+def test_stop_leaves_a_busy_sender_alone(smtp):
+    mail = mail_queue(smtp)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_connect():
+        started.set()
+        release.wait(5)
+        raise OSError("unreachable")
+
+    mail._connect = slow_connect
+    mail.send("user@test.local", "Booking confirmed", "See you soon")
+    started.wait(5)
+    mail.stop(timeout=0.1)
+
+    # The sender is still busy, so it is neither forgotten nor duplicated
+    assert mail._thread is not None and mail._thread.is_alive()
+    mail.start()
+    assert sum(t.name == "mail-sender" for t in threading.enumerate()) == 1
+
+    release.set()
+    mail.stop()
+    assert mail._thread is None
+
+
+def test_outcomes_are_exported(smtp):
+    before = EMAILS._values[(("outcome", "sent"),)]
+    mail = mail_queue(smtp)
+    for n in range(3):
+        mail.send(f"user{n}@test.local", "Booking confirmed", "See you soon")
+    mail.stop()
+
+    assert EMAILS._values[(("outcome", "sent"),)] - before == 3
+    # Only this module's metrics: gauges of apps imported by other tests read stopped repositories
+    rendered = EMAILS.render() + REGISTRY.gauge("serveq_emails_pending", "").render()
+    assert any(line.startswith('serveq_emails_total{outcome="sent"}') for line in rendered)
+    assert "serveq_emails_pending 0" in rendered
@@ -0,0 +1,42 @@
+import pytest
+from fastapi.testclient import TestClient
+
+LOGIN = {"email": "user@test.local", "username": "User"}
+KEY = {"Idempotency-Key": "login-1"}
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_login_retry_replays_pending_otp(load_app, backend):
+    app = load_app(STORAGE_BACKEND=backend)
+    with TestClient(app.app) as client:
+        first = client.post("/api/login", json=LOGIN, headers=KEY)
+        retry = client.post("/api/login", json=LOGIN, headers=KEY)
+
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["otp"] == first.json()["otp"]
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_login_retry_after_otp_used_issues_new_otp(load_app, backend):
+    app = load_app(STORAGE_BACKEND=backend)
+    with TestClient(app.app) as client:
+        otp = client.post("/api/login", json=LOGIN, headers=KEY).json()["otp"]
+        assert client.post("/api/verify-otp", json={"email": LOGIN["email"], "otp": otp}).status_code == 200
+
+        retry = client.post("/api/login", json=LOGIN, headers=KEY)
+        assert "Idempotent-Replayed" not in retry.headers
+        verified = client.post("/api/verify-otp", json={"email": LOGIN["email"], "otp": retry.json()["otp"]})
+        assert verified.status_code == 200
+
+
+def test_login_retry_after_lockout_issues_new_otp(load_app):
+    app = load_app(OTP_MAX_ATTEMPTS="2")
+    with TestClient(app.app) as client:
+        otp = client.post("/api/login", json=LOGIN, headers=KEY).json()["otp"]
+        wrong = str((int(otp) + 1) % 1000000).zfill(6)
+        for _ in range(2):
+            client.post("/api/verify-otp", json={"email": LOGIN["email"], "otp": wrong})
+
+        retry = client.post("/api/login", json=LOGIN, headers=KEY)
+        assert "Idempotent-Replayed" not in retry.headers
+        assert app.OTP_STORE.get(LOGIN["email"])["otp"] == retry.json()["otp"]
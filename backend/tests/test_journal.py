@@ -0,0 +1,24 @@
+from unittest import mock
+
+from utils.repository import JsonRepository
+
+
+def user(n):
+    return {"email": f"user{n}@test.local", "name": f"User {n}"}
+
+
+def test_failed_compactions_keep_every_entry(tmp_path):
+    repository = JsonRepository(tmp_path)
+    repository.load()
+
+    with mock.patch.object(repository, "_write_snapshots", side_effect=OSError("disk full")):
+        for n in range(3):
+            repository.save_user(user(n))
+            # Each failed compaction leaves journal.log.1 behind for the next rotation
+            repository.compact()
+    repository.journal.close()
+
+    reloaded = JsonRepository(tmp_path)
+    reloaded.load()
+    assert [reloaded.get_user(user(n)["email"]) for n in range(3)] == [user(n) for n in range(3)]
+    reloaded.stop()
@@ -0,0 +1,32 @@
+from fastapi.testclient import TestClient
+
+from utils.metrics import Registry
+
+
+def test_gauge_re_registration_takes_the_new_callback():
+    registry = Registry()
+    first = registry.gauge("serveq_test_gauge", "Test gauge", lambda: 1)
+    second = registry.gauge("serveq_test_gauge", "Test gauge", lambda: 2)
+
+    assert second is first
+    assert "serveq_test_gauge 2" in registry.render()
+
+
+def test_metrics_read_the_current_app(load_app):
+    old = load_app()
+    with TestClient(old.app) as client:
+        client.post("/api/login", json={"email": "old@test.local", "username": "Old"})
+
+    app = load_app()
+    with TestClient(app.app) as client:
+        assert "serveq_otp_store_size 0" in client.get("/metrics").text
+
+
+def test_gauge_max_age_reuses_the_callback_result():
+    registry = Registry()
+    calls = []
+    registry.gauge("serveq_test_count", "Test count", lambda: calls.append(1) or len(calls), max_age=60)
+
+    assert "serveq_test_count 1" in registry.render()
+    assert "serveq_test_count 1" in registry.render()
+    assert len(calls) == 1
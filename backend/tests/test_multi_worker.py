@@ -0,0 +1,103 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import BACKEND_DIR, TEST_ENV, seed_data_dir
+
+WORKERS = 3
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request(conn, method, path, body=None):
+    payload = json.dumps(body) if body is not None else None
+    conn.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+
+@pytest.fixture
+def server(tmp_path):
+    seed_data_dir(tmp_path)
+    port = free_port()
+    env = {**os.environ, **TEST_ENV, "PYTHONPATH": str(BACKEND_DIR),
+           "STORAGE_BACKEND": "sqlite", "WEB_CONCURRENCY": str(WORKERS)}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--workers", str(WORKERS)],
+        cwd=tmp_path, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        yield port
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def worker_connections(port):
+    """One keep-alive connection per worker, keyed by the worker's pid."""
+    connections = {}
+    deadline = time.monotonic() + 60
+    while len(connections) < WORKERS:
+        assert time.monotonic() < deadline, f"only reached workers {sorted(connections)}"
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        try:
+            _, health = request(conn, "GET", "/health")
+        except OSError:
+            # Workers still starting
+            conn.close()
+            time.sleep(0.2)
+            continue
+        if health["worker"] in connections:
+            conn.close()
+        else:
+            connections[health["worker"]] = conn
+    return list(connections.values())
+
+
+def test_login_verify_and_book_across_workers(server):
+    connections = worker_connections(server)
+    day = (datetime.now() + timedelta(days=2)).strftime("%Y-%m-%d")
+    slots = ["09:00 AM-09:30 AM", "09:30 AM-10:00 AM", "10:00 AM-10:30 AM"]
+
+    for i, login_conn in enumerate(connections):
+        email = f"user{i}@test.local"
+        status, body = request(login_conn, "POST", "/api/login", {"email": email, "username": "test"})
+        assert status == 200
+        otp = body["otp"]
+
+        # The OTP is visible from every worker: a wrong code is "invalid", not "no OTP found"
+        for conn in connections:
+            status, _ = request(conn, "POST", "/api/verify-otp", {"email": email, "otp": "wrong"})
+            assert status == 400
+
+        verify_conn = connections[(i + 1) % WORKERS]
+        status, body = request(verify_conn, "POST", "/api/verify-otp", {"email": email, "otp": otp})
+        assert status == 200 and body["user"]["email"] == email
+
+        book_conn = connections[(i + 2) % WORKERS]
+        status, body = request(book_conn, "POST", "/api/book", {"email": email, "slot": f"{day} {slots[i]}"})
+        assert status == 200
+
+    # Availability is refreshed from SQLite within a second
+    time.sleep(1.5)
+    for conn in connections:
+        for i in range(WORKERS):
+            status, body = request(conn, "GET", f"/api/queue?email=user{i}@test.local")
+            assert status == 200
+        status, body = request(conn, "GET", f"/api/slots?date={day}")
+        assert [s["is_booked"] for s in body["slots"][:WORKERS]] == [True] * WORKERS
+
+        # A second booking for the same slot is refused by every worker
+        status, _ = request(conn, "POST", "/api/book", {"email": "late@test.local", "slot": f"{day} {slots[0]}"})
+        assert status == 409
@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+from utils.otp import MemoryOtpStore, SqliteOtpStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**options):
+        if request.param == "sqlite":
+            return SqliteOtpStore(tmp_path / "serveq.db", **options)
+        return MemoryOtpStore(**options)
+    return make
+
+
+def record(expires_in):
+    return {"otp": "123456", "expires_at": time.time() + expires_in}
+
+
+def test_evicts_closest_to_expiry_when_full(make_store):
+    store = make_store(capacity=3)
+    for n, expires_in in enumerate([300, 100, 200]):
+        store.put(f"user{n}@test.local", record(expires_in))
+    store.put("user3@test.local", record(300))
+
+    assert len(store) == 3
+    assert store.get("user1@test.local") is None
+    assert store.get("user3@test.local") is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_sweeps_expired_records_on_put(make_store):
+    store = make_store(capacity=10)
+    store.put("gone@test.local", record(-1))
+    store.put("user@test.local", record(300))
+
+    assert store.get("gone@test.local") is None
+    assert len(store) == 1
+    assert store.stats()["expirations"] == 1
+    assert store.stats()["evictions"] == 0
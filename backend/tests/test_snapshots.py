@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from utils import serialization
+from utils.serialization import decode, detect
+
+SNAPSHOTS = ("users.json", "bookings.json", "notifications.json", "meta.json")
+
+
+@pytest.mark.parametrize("data", [b"", b"  \n"])
+def test_blank_data_is_not_msgpack(data):
+    assert detect(data) is None
+    assert decode(data) is None
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_starts_with_empty_snapshot_files(load_app, backend):
+    # app.json's postdeploy creates the data files with touch
+    app = load_app(files={name: b"" for name in SNAPSHOTS}, STORAGE_BACKEND=backend)
+
+    with TestClient(app.app) as client:
+        assert client.get("/health").status_code == 200
+        assert app.repository.active_bookings() == []
+
+
+def test_truncated_snapshot_still_fails(load_app):
+    with pytest.raises(ValueError):
+        app = load_app(files={"bookings.json": b'[{"id": "b1", "email"'})
+        with TestClient(app.app):
+            pass
+
+
+@pytest.mark.parametrize("fmt", ["pretty", "compact"])
+def test_stdlib_fallback_matches_orjson(monkeypatch, fmt):
+    record = {"email": "zoë@test.local", "username": "Zoë 🎉", "seat": 0}
+    fast = serialization.encode(record, fmt)
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert serialization.encode(record, fmt) == fast
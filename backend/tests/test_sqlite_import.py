@@ -0,0 +1,31 @@
+import json
+
+from utils.sqlite_repository import SqliteRepository
+
+
+def booking(booking_id, email, slot_start, status="ACTIVE"):
+    return {"id": booking_id, "email": email, "slot_start": slot_start, "slot_end": slot_start, "status": status}
+
+
+def test_import_skips_bookings_that_clash_with_active_ones(tmp_path):
+    repository = SqliteRepository(tmp_path / "serveq.db", pool_size=1)
+    repository.load()
+    repository.add_booking(booking("live", "user@test.local", "2030-01-01T09:00:00+05:30"))
+
+    (tmp_path / "bookings.json").write_text(json.dumps([
+        booking("same-email", "user@test.local", "2030-01-02T09:00:00+05:30"),
+        booking("same-seat", "other@test.local", "2030-01-01T09:00:00+05:30"),
+        booking("old", "user@test.local", "2029-01-01T09:00:00+05:30", status="CANCELLED"),
+    ]))
+    skipped = repository.import_json(tmp_path)
+
+    assert skipped == ["same-email", "same-seat"]
+    assert repository.get_active_booking("user@test.local")["id"] == "live"
+    assert repository.get_booking("old")["status"] == "CANCELLED"
+
+    # Re-importing updates bookings by id
+    cancelled = booking("live", "user@test.local", "2030-01-01T09:00:00+05:30", status="CANCELLED")
+    (tmp_path / "bookings.json").write_text(json.dumps([cancelled]))
+    assert repository.import_json(tmp_path) == []
+    assert repository.get_booking("live")["status"] == "CANCELLED"
+    repository.stop()
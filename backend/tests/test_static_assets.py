@@ -0,0 +1,32 @@
+import pytest
+
+from utils.static_assets import Asset, StaticAssets, parse_accept_encoding
+
+
+@pytest.fixture
+def asset():
+    asset = Asset("app.js", None, "application/javascript", '"etag"', "no-cache", b"plain" * 100)
+    asset.gzip = b"gzipped" * 10
+    asset.br = b"brotli" * 5
+    return asset
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip, br;q=0.5, *;q=0") == {"gzip": 1.0, "br": 0.5, "*": 0.0}
+    assert parse_accept_encoding("") == {}
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("gzip;q=0, br;q=0", None),
+    ("*", "br"),
+    ("*;q=0, gzip", "gzip"),
+    ("x-gzip-like, brx", None),
+    ("", None),
+])
+def test_select_honours_q_values(tmp_path, asset, header, expected):
+    body, encoding = StaticAssets(tmp_path).select(asset, header)
+    assert encoding == expected
+    assert body == {"br": asset.br, "gzip": asset.gzip, None: asset.body}[expected]
@@ -0,0 +1,223 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+
+from utils.metrics import REGISTRY
+from utils.serialization import dumps, loads
+
+ADMISSION_DECISIONS = REGISTRY.counter(
+    "serveq_admission_decisions_total",
+    "Requests seen by admission control, by route and decision"
+)
+
+# Bodies larger than this are not inspected for an email (the handlers reject them anyway)
+MAX_INSPECTED_BODY = 64 * 1024
+
+
+class RateLimiter:
+    """Token buckets of ``burst`` tokens refilled at ``rate`` per second, one per key.
+
+    Only the ``max_keys`` most recently used buckets are kept; an evicted
+    key starts again with a full bucket, which only ever errs on the side of
+    admitting. A ``rate`` of 0 disables the limiter.
+    """
+
+    def __init__(self, rate, burst, max_keys=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def acquire(self, key, now=None):
+        """Take a token for ``key``; returns 0 on success, else seconds until one is available."""
+        if not self.rate:
+            return 0
+        now = time.monotonic() if now is None else now
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class ConcurrencyLimiter:
+    """At most ``limit`` requests at once; up to ``queue_size`` more wait, each
+    for at most ``timeout`` seconds, in arrival order. A ``limit`` of 0 disables it.
+    """
+
+    def __init__(self, limit, queue_size, timeout):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters = deque()
+
+    async def acquire(self):
+        """"admitted", "queued" (admitted after waiting), "queue_full" or "timeout"."""
+        if not self.limit:
+            return "admitted"
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return "admitted"
+        if len(self._waiters) >= self.queue_size:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as we gave up; pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return "timeout"
+        return "queued"
+
+    def release(self):
+        if not self.limit:
+            return
+        # The slot passes straight to the next waiter, so active stays the same
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that admits or rejects requests to the hot POST routes
+    before they take a threadpool thread.
+
+    ``routes`` maps a path to its ConcurrencyLimiter. A request to one of
+    them must first get a token from the per-IP and per-email RateLimiters
+    (the email is read from the JSON body), or it is rejected with 429. It
+    then needs a concurrency slot; when all are taken it waits in the
+    route's short queue, and is rejected with 503 if the queue is full or the
+    wait times out. Both rejections carry ``Retry-After``. Every other
+    request passes straight through, so a burst on the hot routes cannot
+    starve ``/health`` and the read endpoints.
+
+    Behind ``proxy_hops`` reverse proxies, the client address is the entry
+    that the outermost proxy appended to ``X-Forwarded-For``, counted from
+    the right. Entries further left come from the client and can be forged.
+
+    Runs on the event loop only, so the limiters need no locks.
+    """
+
+    def __init__(self, app, routes, ip_limiter, email_limiter, proxy_hops=0):
+        self.app = app
+        self.routes = routes
+        self.ip_limiter = ip_limiter
+        self.email_limiter = email_limiter
+        self.proxy_hops = proxy_hops
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path") if scope["type"] == "http" else None
+        limiter = self.routes.get(path)
+        if limiter is None or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        wait = self.ip_limiter.acquire((path, self._client_ip(scope)))
+        if wait:
+            ADMISSION_DECISIONS.inc(route=path, decision="rate_limited_ip")
+            await self._reject(send, 429, "Too many requests, slow down", wait)
+            return
+
+        body, receive = await self._buffer(receive)
+        email = self._email(body)
+        if email is not None:
+            wait = self.email_limiter.acquire((path, email))
+            if wait:
+                ADMISSION_DECISIONS.inc(route=path, decision="rate_limited_email")
+                await self._reject(send, 429, "Too many requests for this email, slow down", wait)
+                return
+
+        decision = await limiter.acquire()
+        ADMISSION_DECISIONS.inc(route=path, decision=decision)
+        if decision not in ("admitted", "queued"):
+            await self._reject(send, 503, "Server busy, try again shortly", limiter.timeout)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    def _client_ip(self, scope):
+        if self.proxy_hops:
+            forwarded = []
+            for name, value in scope["headers"]:
+                if name == b"x-forwarded-for":
+                    forwarded.extend(hop.strip() for hop in value.decode("latin-1").split(","))
+            if len(forwarded) >= self.proxy_hops:
+                return forwarded[-self.proxy_hops]
+        client = scope.get("client")
+        return client[0] if client else None
+
+    @staticmethod
+    async def _buffer(receive):
+        """Read the request body, and a receive callable that replays it."""
+        chunks = []
+        more = True
+        while more:
+            message = await receive()
+            if message["type"] != "http.request":
+                # Client went away; let the app see the disconnect
+                chunks = None
+                pending = message
+                break
+            chunks.append(message.get("body", b""))
+            more = message.get("more_body", False)
+
+        if chunks is None:
+            async def replay():
+                return pending
+            return b"", replay
+
+        body = b"".join(chunks)
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+        return body, replay
+
+    @staticmethod
+    def _email(body):
+        if not body or len(body) > MAX_INSPECTED_BODY:
+            return None
+        try:
+            email = loads(body).get("email")
+        except (ValueError, AttributeError):
+            return None
+        return email if isinstance(email, str) else None
+
+    @staticmethod
+    async def _reject(send, status, detail, retry_after):
+        body = dumps({"success": False, "detail": detail})
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,56 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveJob:
+    """Background job that keeps the repository's hot set down to live data.
+
+    Once at start and then every ``interval`` seconds it calls
+    ``repository.archive(today())``, moving bookings for past days and cleared
+    notifications into the archive. Listeners registered with ``add_listener``
+    are then called with the same cutoff date, so per-day indexes can drop
+    the days that were archived.
+    """
+
+    def __init__(self, repository, today, interval=3600):
+        self.repository = repository
+        self.today = today
+        self.interval = interval
+        self._listeners = []
+        self._thread = None
+        self._stop = threading.Event()
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def run_once(self):
+        before = self.today()
+        try:
+            moved = self.repository.archive(before)
+        except Exception as e:
+            logger.error("Archiving records before %s failed: %s", before, e, exc_info=True)
+            return None
+        for callback in self._listeners:
+            callback(before)
+        return moved
+
+    def _run(self):
+        self.run_once()
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def start(self):
+        if self._thread is not None or not self.interval:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="archiver", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
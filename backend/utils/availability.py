@@ -0,0 +1,138 @@
+import threading
+import time
+from array import array
+
+
+class AvailabilityEngine:
+    """Per-date slot occupancy kept as one count array per day.
+
+    The Schedule expands slots.json into a slot template per weekday, each slot
+    carrying its capacity (the seats of the counters open at that time). Each
+    date maps to an array holding the number of ACTIVE bookings per slot of
+    its template, and bookings increment their slot's count as they are made.
+    Checking a slot is one comparison of count against capacity, and answering
+    a day costs one pass over its template, independent of how many bookings
+    or counters exist.
+
+    Every date also carries a version that is bumped whenever its counts
+    change; together with the index of the first still-bookable slot it
+    identifies a rendering of the day, which callers use for ETags and caching.
+
+    When several processes write bookings (``refresh_after`` > 0), a date's
+    counts are reloaded from storage once they are older than
+    ``refresh_after`` seconds, so other workers' bookings show up within that
+    window.
+    """
+
+    def __init__(self, repository, refresh_after=0):
+        self.repository = repository
+        self.refresh_after = refresh_after
+        self.configured = False
+        self.schedule = None
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._versions = {}
+        self._loaded_at = {}
+
+    def configure(self, schedule):
+        self.schedule = schedule
+        self.interval = schedule.interval
+        self.configured = True
+
+    def _count_bookings(self, bookings):
+        counts = {}
+        for booking in bookings:
+            date, index = self.schedule.locate(booking["slot_start"])
+            if index is None:
+                continue
+            if date not in counts:
+                counts[date] = array("H", bytes(2 * len(self.schedule.template(date))))
+            counts[date][index] += 1
+        return counts
+
+    def rebuild(self, bookings):
+        counts = self._count_bookings(bookings)
+        with self._lock:
+            for date in counts.keys() | self._counts.keys():
+                if counts.get(date) != self._counts.get(date):
+                    self._versions[date] = self._versions.get(date, 0) + 1
+            self._counts = counts
+            self._loaded_at = {}
+
+    def mark(self, booking):
+        date, index = self.schedule.locate(booking["slot_start"])
+        if index is None:
+            return
+        with self._lock:
+            counts = self._counts.get(date)
+            if counts is None:
+                counts = self._counts[date] = array("H", bytes(2 * len(self.schedule.template(date))))
+            counts[index] += 1
+            self._versions[date] = self._versions.get(date, 0) + 1
+
+    def unmark(self, booking):
+        date, index = self.schedule.locate(booking["slot_start"])
+        if index is None:
+            return
+        with self._lock:
+            counts = self._counts.get(date)
+            if counts is None or not counts[index]:
+                return
+            counts[index] -= 1
+            self._versions[date] = self._versions.get(date, 0) + 1
+
+    def prune(self, before):
+        """Forget dates before ``before``; they render as empty, unbookable days."""
+        with self._lock:
+            for index in (self._counts, self._versions, self._loaded_at):
+                for date in [d for d in index if d < before]:
+                    del index[date]
+
+    def _occupancy(self, date):
+        if self.refresh_after and time.monotonic() - self._loaded_at.get(date, 0) > self.refresh_after:
+            counts = self._count_bookings(self.repository.active_bookings_on(date)).get(date)
+            with self._lock:
+                if counts != self._counts.get(date):
+                    self._versions[date] = self._versions.get(date, 0) + 1
+                if counts is None:
+                    self._counts.pop(date, None)
+                else:
+                    self._counts[date] = counts
+                self._loaded_at[date] = time.monotonic()
+            return counts
+        return self._counts.get(date)
+
+    def remaining(self, slot_start):
+        """Free seats left in a slot; 0 when it is full or not on the schedule."""
+        date, index = self.schedule.locate(slot_start)
+        if index is None:
+            return 0
+        counts = self._occupancy(date)
+        booked = counts[index] if counts is not None else 0
+        return max(self.schedule.template(date)[index].capacity - booked, 0)
+
+    def has_room(self, slot_start):
+        return self.remaining(slot_start) > 0
+
+    def state(self, date, now):
+        """(version, first bookable index) of a date; equal states render identical slots."""
+        self._occupancy(date)
+        return self._versions.get(date, 0), self.schedule.first_bookable(date, now)
+
+    def day(self, date, now):
+        """Slots for a YYYY-MM-DD date as seen at ``now`` (an IST datetime)."""
+        counts = self._occupancy(date)
+        first_bookable = self.schedule.first_bookable(date, now)
+        slots = []
+        for i, slot in enumerate(self.schedule.template(date)):
+            booked = counts[i] if counts is not None else 0
+            is_booked = booked >= slot.capacity
+            slots.append({
+                "start": slot.start,
+                "end": slot.end,
+                "capacity": slot.capacity,
+                "available": max(slot.capacity - booked, 0),
+                "is_bookable": i >= first_bookable and not is_booked,
+                "is_booked": is_booked
+            })
+        return slots
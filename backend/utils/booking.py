@@ -0,0 +1,145 @@
+import threading
+import zlib
+from contextlib import contextmanager
+
+from utils.repository import BookingConflict, SlotTaken
+
+
+class StripedLock:
+    """A fixed pool of locks addressed by key hash.
+
+    Keys that land on different stripes never contend, while the same key
+    always maps to the same lock, so memory stays constant no matter how many
+    slots or emails are seen.
+    """
+
+    def __init__(self, stripes=64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def stripe(self, key):
+        return zlib.crc32(key.encode()) % len(self._locks)
+
+    @contextmanager
+    def hold(self, key):
+        lock = self._locks[self.stripe(key)]
+        with lock:
+            yield
+
+    @contextmanager
+    def hold_all(self):
+        # Always in stripe order, so two holders cannot deadlock
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+
+
+class BookingEngine:
+    """Atomic check-and-reserve for bookings.
+
+    A reservation holds the stripe for the user's email and then the stripe for
+    the slot (always in that order, so two reservations cannot deadlock) while
+    it re-checks both conflicts and writes the booking and its confirmation.
+    Bookings for different slots by different users proceed in parallel.
+
+    A slot has one seat per unit of counter capacity; the booking takes the
+    lowest free seat and records it with the counter that serves it.
+
+    Listeners registered with ``add_listener`` are called with each new booking
+    after it is stored, and those registered with ``add_cancel_listener`` with
+    each cancelled one, which is how derived indexes stay up to date.
+
+    ``reserve_many`` takes every stripe, then stores a whole batch through a
+    single repository transaction.
+    """
+
+    def __init__(self, repository, stripes=64):
+        self.repository = repository
+        self._email_locks = StripedLock(stripes)
+        self._slot_locks = StripedLock(stripes)
+        self._listeners = []
+        self._cancel_listeners = []
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def add_cancel_listener(self, callback):
+        self._cancel_listeners.append(callback)
+
+    def reserve(self, booking, notification, seats=(None,)):
+        """Store ``booking`` in a free seat of its slot; ``seats`` lists the counter of each seat."""
+        with self._email_locks.hold(booking["email"]), self._slot_locks.hold(booking["slot_start"]):
+            if self.repository.get_active_booking(booking["email"]):
+                raise BookingConflict("User already has an active booking")
+
+            booking = self._claim_seat(booking, seats)
+            self.repository.add_notification(notification)
+
+        for callback in self._listeners:
+            callback(booking)
+        return booking
+
+    def reserve_many(self, items):
+        """Reserve a batch of ``(booking, seats)`` pairs; returns ``(booking, error)`` per item.
+
+        Items are checked in order against storage and against the batch
+        itself, and the accepted ones are written in one transaction.
+        """
+        results = [None] * len(items)
+        accepted = []
+        with self._email_locks.hold_all(), self._slot_locks.hold_all():
+            emails = set()
+            taken = {}
+            for i, (booking, seats) in enumerate(items):
+                if booking["email"] in emails or self.repository.get_active_booking(booking["email"]):
+                    results[i] = (None, "User already has an active booking")
+                    continue
+                slot_taken = taken.get(booking["slot_start"])
+                if slot_taken is None:
+                    slot_taken = taken[booking["slot_start"]] = {
+                        b.get("seat", 0) for b in self.repository.bookings_at(booking["slot_start"])
+                    }
+                seat = next((s for s in range(len(seats)) if s not in slot_taken), None)
+                if seat is None:
+                    results[i] = (None, "Slot already booked")
+                    continue
+                slot_taken.add(seat)
+                emails.add(booking["email"])
+                accepted.append((i, {**booking, "seat": seat, "counter": seats[seat]}))
+
+            errors = self.repository.add_bookings([booking for _, booking in accepted])
+            for (i, booking), error in zip(accepted, errors):
+                results[i] = (booking, None) if error is None else (None, str(error))
+
+        for booking, _ in results:
+            if booking is not None:
+                for callback in self._listeners:
+                    callback(booking)
+        return results
+
+    def cancel(self, booking_ids):
+        """Cancel ACTIVE bookings in one transaction; returns {id: cancelled booking or None}."""
+        results = self.repository.cancel_bookings(booking_ids)
+        for booking in results.values():
+            if booking is not None:
+                for callback in self._cancel_listeners:
+                    callback(booking)
+        return results
+
+    def _claim_seat(self, booking, seats):
+        # Another worker may fill a seat between the read and the insert; then try the next free one
+        for _ in range(len(seats)):
+            taken = {b.get("seat", 0) for b in self.repository.bookings_at(booking["slot_start"])}
+            free = [seat for seat in range(len(seats)) if seat not in taken]
+            if not free:
+                break
+            claimed = {**booking, "seat": free[0], "counter": seats[free[0]]}
+            try:
+                self.repository.add_booking(claimed)
+            except SlotTaken:
+                continue
+            return claimed
+        raise BookingConflict("Slot already booked")
@@ -1,26 +1,243 @@
-import smtplib
+import heapq
+import logging
 import os
+import queue
+import smtplib
+import threading
+import time
 from email.message import EmailMessage
 from dotenv import load_dotenv
 
+from utils.metrics import REGISTRY
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SMTP_EMAIL = os.getenv("SMTP_EMAIL")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 SMTP_HOST = os.getenv("SMTP_HOST")
-SMTP_PORT = int(os.getenv("SMTP_PORT"))
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SSL = os.getenv("SMTP_SSL", "true").lower() == "true"
+
+EMAILS = REGISTRY.counter("serveq_emails_total", "Outbound emails, by outcome")
+# Outcomes of MailQueue.metrics that are exported as EMAILS
+EXPORTED_OUTCOMES = ("sent", "failed", "retried", "rejected")
+
+
+class MailQueue:
+    """Outbound mail queue drained by a background sender thread.
+
+    ``send`` only enqueues, so callers never wait on SMTP. The sender keeps one
+    authenticated connection open between batches (closing it after
+    ``idle_timeout`` seconds without mail), sends up to ``batch_size`` queued
+    messages per wakeup, and retries failures with exponential backoff until
+    ``max_retries`` is exhausted.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_ssl=True, sender=None,
+                 batch_size=50, max_retries=5, backoff=1.0, idle_timeout=60.0, maxsize=10000):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.sender = sender or username
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+
+        self._queue = queue.Queue(maxsize)
+        self._retries = []
+        self._server = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            "queued": 0,
+            "sent": 0,
+            "failed": 0,
+            "retried": 0,
+            "rejected": 0,
+            "batches": 0,
+            "connections": 0,
+            "send_seconds": 0.0
+        }
+
+    def _count(self, name, amount=1):
+        with self._metrics_lock:
+            self.metrics[name] += amount
+        if name in EXPORTED_OUTCOMES:
+            EMAILS.inc(amount, outcome=name)
+
+    def stats(self):
+        with self._metrics_lock:
+            return {**self.metrics, "pending": self._queue.qsize() + len(self._retries)}
+
+    # ---------------- PRODUCER SIDE ---------------- #
+
+    def send(self, to, subject, body):
+        """Queue a message; returns False if the queue is full."""
+        msg = EmailMessage()
+        msg["From"] = self.sender
+        msg["To"] = to
+        msg["Subject"] = subject
+        msg.set_content(body)
+
+        try:
+            self._queue.put_nowait((msg, 0))
+        except queue.Full:
+            self._count("rejected")
+            logger.warning("Mail queue full, dropping email to %s", to)
+            return False
+        self._count("queued")
+        return True
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="mail-sender", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Stop the sender after it drains what is already queued (bounded by ``timeout``).
+        Messages still backing off before a retry are dropped and counted as failed."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            # Still mid-send; the sender closes its own connection when it exits
+            logger.warning("Mail sender still running after %.1fs, leaving it to finish", timeout)
+            return
+        self._thread = None
+
+    # ---------------- SENDER SIDE ---------------- #
+
+    def _connect(self):
+        if self._server is not None:
+            return self._server
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=30)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        self._server = server
+        self._count("connections")
+        return server
+
+    def _disconnect(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            pass
+        self._server = None
+
+    def _next_batch(self, wait):
+        batch = []
+        now = time.monotonic()
+        while self._retries and self._retries[0][0] <= now and len(batch) < self.batch_size:
+            _, _, msg, attempt = heapq.heappop(self._retries)
+            batch.append((msg, attempt))
+
+        if not batch:
+            try:
+                batch.append(self._queue.get(timeout=wait))
+            except queue.Empty:
+                return batch
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _deliver(self, msg, attempt):
+        started = time.perf_counter()
+        try:
+            try:
+                self._connect().send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # The persistent connection went stale; reconnect once and retry right away
+                self._server = None
+                self._connect().send_message(msg)
+        except Exception as e:
+            self._disconnect()
+            if attempt + 1 >= self.max_retries:
+                self._count("failed")
+                logger.error("Email to %s failed after %s attempts: %s", msg["To"], attempt + 1, e)
+            else:
+                self._count("retried")
+                delay = self.backoff * (2 ** attempt)
+                heapq.heappush(self._retries, (time.monotonic() + delay, id(msg), msg, attempt + 1))
+                logger.warning("Email to %s failed, retrying in %.1fs: %s", msg["To"], delay, e)
+            return
+        self._count("sent")
+        self._count("send_seconds", time.perf_counter() - started)
+        logger.debug("Email sent to %s", msg["To"])
+
+    def _run(self):
+        idle_since = time.monotonic()
+        while True:
+            if self._stopping.is_set() and self._queue.empty():
+                break
+
+            wait = 0.5
+            if self._retries:
+                wait = min(wait, max(self._retries[0][0] - time.monotonic(), 0))
+            batch = self._next_batch(wait)
+
+            if not batch:
+                if self._server is not None and time.monotonic() - idle_since > self.idle_timeout:
+                    self._disconnect()
+                continue
+
+            self._count("batches")
+            for msg, attempt in batch:
+                self._deliver(msg, attempt)
+            idle_since = time.monotonic()
+
+        # Retries still waiting out their backoff will not be sent
+        if self._retries:
+            self._count("failed", len(self._retries))
+            logger.error("Dropping %s emails awaiting retry at shutdown", len(self._retries))
+            for _, _, msg, attempt in self._retries:
+                logger.error("Email to %s not sent after %s attempts", msg["To"], attempt)
+            self._retries = []
+        self._disconnect()
+
+
+_default_queue = None
+_default_lock = threading.Lock()
+
+
+def default_queue():
+    global _default_queue
+    with _default_lock:
+        if _default_queue is None:
+            _default_queue = MailQueue(
+                SMTP_HOST, SMTP_PORT, SMTP_EMAIL, SMTP_PASSWORD, use_ssl=SMTP_SSL
+            )
+            _default_queue.start()
+        return _default_queue
+
+
+REGISTRY.gauge(
+    "serveq_emails_pending", "Emails queued or awaiting a retry",
+    lambda: _default_queue.stats()["pending"] if _default_queue is not None else 0
+)
+
 
 def send_email(to, subject, body):
-    msg = EmailMessage()
-    msg["From"] = SMTP_EMAIL
-    msg["To"] = to
-    msg["Subject"] = subject
-    msg.set_content(body)
-
-    try:
-        with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) as server:
-            server.login(SMTP_EMAIL, SMTP_PASSWORD)
-            server.send_message(msg)
-            print(f"✅ Email sent to {to}")
-    except Exception as e:
-        print("❌ Email failed:", e)
+    """Queue an email for background delivery; never blocks on SMTP."""
+    return default_queue().send(to, subject, body)
+
+
+def shutdown():
+    if _default_queue is not None:
+        _default_queue.stop()
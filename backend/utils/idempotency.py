@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+
+from utils.metrics import REGISTRY
+
+IDEMPOTENT_REQUESTS = REGISTRY.counter(
+    "serveq_idempotent_requests_total",
+    "Requests carrying an Idempotency-Key, by scope and outcome"
+)
+
+
+class IdempotencyMismatch(Exception):
+    """The key was already used for a request with a different body."""
+
+
+class IdempotencyInProgress(Exception):
+    """The first request with the key did not finish within the wait timeout."""
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "done", "failed", "value", "expires_at")
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.failed = False
+        self.value = None
+        self.expires_at = None
+
+
+class IdempotencyCache:
+    """Bounded, TTL-limited memory of completed requests, keyed by idempotency key.
+
+    ``run(key, fingerprint, fn)`` calls ``fn`` the first time a key is seen and
+    keeps its return value for ``ttl`` seconds; later calls with the key get
+    that value back without calling ``fn``. A call arriving while the first
+    one is still running waits up to ``wait_timeout`` seconds for it instead
+    of racing it. If ``fn`` raises, nothing is kept and the next caller runs
+    it again. ``fingerprint`` identifies the request body, so a key reused
+    for a different request is rejected rather than answered with the wrong
+    result. At most ``capacity`` keys are kept; the oldest go first. ``run``
+    may shorten the TTL for results that go stale sooner, and its ``fresh``
+    predicate can retire a kept value early: when it returns False for the
+    value, the key is forgotten and ``fn`` runs again.
+    """
+
+    def __init__(self, capacity=10000, ttl=86400, wait_timeout=10.0):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        # Entries are kept in insertion order, so (TTL overrides aside) expired ones sit at the front
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if entry.expires_at is None or entry.expires_at > now:
+                break
+            self._entries.popitem(last=False)
+
+    def run(self, key, fingerprint, fn, ttl=None, fresh=None):
+        """(value, replayed) for ``key``; ``replayed`` is True when ``fn`` ran for an earlier call."""
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._expire(now)
+                entry = self._entries.get(key)
+                if entry is not None and entry.expires_at is not None and entry.expires_at <= now:
+                    del self._entries[key]
+                    entry = None
+                if entry is None:
+                    entry = self._entries[key] = _Entry(fingerprint)
+                    while len(self._entries) > self.capacity:
+                        self._entries.popitem(last=False)
+                    break
+
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyMismatch(key)
+            if not entry.done.wait(max(deadline - time.monotonic(), 0)):
+                raise IdempotencyInProgress(key)
+            if entry.failed:
+                # The first call raised and released the key; try to become the one that runs it
+                continue
+            if fresh is None or fresh(entry.value):
+                return entry.value, True
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+
+        try:
+            value = fn()
+        except BaseException:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            entry.failed = True
+            entry.done.set()
+            raise
+
+        entry.value = value
+        entry.expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        entry.done.set()
+        return value, False
+
+    def __len__(self):
+        return len(self._entries)
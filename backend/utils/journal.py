@@ -0,0 +1,126 @@
+import logging
+import os
+import threading
+import time
+
+from utils.metrics import record_io
+from utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+
+class Journal:
+    """Append-only, line-per-mutation log with group-committed fsyncs.
+
+    ``write`` only appends to the file buffer and hands back a sequence number;
+    ``sync`` blocks until that sequence is on disk. Whichever caller finds no
+    fsync in progress becomes the leader and syncs everything written so far,
+    so concurrent writers share a single fsync instead of paying one each.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = 0
+        self._cond = threading.Condition()
+        self._file = None
+        self._written = 0
+        self._synced = 0
+        self._syncing = False
+
+    def open(self):
+        self._file = open(self.path, "ab")
+        self.entries = 0
+
+    def close(self):
+        with self._cond:
+            self._wait_idle()
+            if self._file is not None:
+                self._flush_locked()
+                self._file.close()
+                self._file = None
+
+    def write(self, entry):
+        line = dumps(entry) + b"\n"
+        with self._cond:
+            started = time.perf_counter()
+            self._file.write(line)
+            record_io("write", "journal", len(line), time.perf_counter() - started)
+            self._written += 1
+            self.entries += 1
+            return self._written
+
+    def sync(self, seq):
+        with self._cond:
+            while self._synced < seq:
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+
+                self._syncing = True
+                target = self._written
+                try:
+                    self._file.flush()
+                    fd = self._file.fileno()
+                    self._cond.release()
+                    try:
+                        started = time.perf_counter()
+                        os.fsync(fd)
+                        record_io("fsync", "journal", 0, time.perf_counter() - started)
+                    finally:
+                        self._cond.acquire()
+                    self._synced = max(self._synced, target)
+                finally:
+                    self._syncing = False
+                    self._cond.notify_all()
+
+    def rotate(self, rotated_path):
+        """Make the current log durable, move it aside and start an empty one.
+
+        If ``rotated_path`` is still there (its snapshot never landed), the
+        current log is appended to it rather than replacing it.
+        """
+        with self._cond:
+            self._wait_idle()
+            self._flush_locked()
+            self._file.close()
+            if rotated_path.exists():
+                with open(self.path, "rb") as src, open(rotated_path, "ab") as dst:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                # Entries now in both files replay idempotently if we crash here
+                self._file = open(self.path, "wb")
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            else:
+                os.replace(self.path, rotated_path)
+                self._file = open(self.path, "ab")
+            self.entries = 0
+
+    def _wait_idle(self):
+        while self._syncing:
+            self._cond.wait()
+
+    def _flush_locked(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._synced = self._written
+
+    @staticmethod
+    def replay(path):
+        """Yield the entries of a journal file, skipping a torn trailing line."""
+        if not path.exists():
+            return
+        with open(path, "rb") as f:
+            lines = f.read().split(b"\n")
+
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield loads(line)
+            except ValueError:
+                if number == len(lines):
+                    logger.warning("Ignoring torn final entry in %s", path.name)
+                else:
+                    logger.error("Skipping corrupt entry on line %s of %s", number, path.name)
@@ -0,0 +1,217 @@
+import contextvars
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+from utils.metrics import REGISTRY
+
+REQUEST_ID = contextvars.ContextVar("request_id", default=None)
+REQUEST_PATH = contextvars.ContextVar("request_path", default=None)
+
+LOG_RECORDS_DROPPED = REGISTRY.counter("serveq_log_records_dropped_total", "Log records not emitted, by reason")
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+access_logger = logging.getLogger("serveq.access")
+
+_listener = None
+
+
+class ContextFilter(logging.Filter):
+    """Stamp each record with the request it was logged from.
+
+    Runs on the calling thread (sync handlers inherit the request's context
+    in the threadpool), before the record crosses to the listener thread.
+    """
+
+    def filter(self, record):
+        record.request_id = REQUEST_ID.get()
+        record.route = REQUEST_PATH.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of routine records on noisy routes.
+
+    ``rates`` maps a request path to the share of its sub-WARNING records that
+    are kept. Warnings and errors always pass, as does anything logged
+    outside a request or on a route without a rate.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, "route", None))
+        if rate is None or random.random() < rate:
+            return True
+        LOG_RECORDS_DROPPED.inc(reason="sampled")
+        return False
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler renders the message (and any traceback) before
+    enqueueing; the listener lives in this process, so the record can cross
+    the queue untouched and request threads only pay for a ``put``. When the
+    queue is full the record is dropped rather than blocking the caller.
+    """
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(reason="queue_full")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        return f"{line} [{request_id}]" if request_id else line
+
+
+def parse_sample_rates(spec):
+    """Parse ``"/api/slots=0.05,/metrics=0"`` into ``{path: rate}``."""
+    rates = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        path, _, rate = item.partition("=")
+        rates[path.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+def configure_logging(level="INFO", fmt="json", sample_rates=None, queue_size=10000):
+    """Route all logging through a bounded queue drained by a listener thread."""
+    global _listener
+    stop_logging()
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT))
+
+    handler = DeferredQueueHandler(queue.Queue(queue_size))
+    handler.addFilter(ContextFilter())
+    handler.addFilter(SamplingFilter(sample_rates or {}))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and log synchronously from then on."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        if isinstance(existing, DeferredQueueHandler):
+            root.removeHandler(existing)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener = None
+
+
+class AccessLogMiddleware:
+    """ASGI middleware that tags requests with an id and writes JSON access logs.
+
+    An incoming ``X-Request-ID`` is reused when it looks sane, otherwise one is
+    generated; either way it is echoed on the response and attached to every
+    record logged while serving the request. Error responses are logged at
+    WARNING/ERROR so sampling never hides them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not _REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        id_token = REQUEST_ID.set(request_id)
+        path_token = REQUEST_PATH.set(scope["path"])
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            if status_code >= 500:
+                level = logging.ERROR
+            elif status_code >= 400:
+                level = logging.WARNING
+            else:
+                level = logging.INFO
+            client = scope.get("client")
+            access_logger.log(
+                level, "%s %s %s %.2fms", scope["method"], scope["path"], status_code, duration_ms,
+                extra={"fields": {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": duration_ms,
+                    "client": client[0] if client else None
+                }}
+            )
+            REQUEST_PATH.reset(path_token)
+            REQUEST_ID.reset(id_token)
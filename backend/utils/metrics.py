@@ -0,0 +1,272 @@
+import collections
+import sys
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = collections.defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(key)} {value}")
+        return lines
+
+
+class Gauge:
+    """A gauge whose value is either set directly or read from a callback at scrape time.
+
+    With ``max_age`` a callback result is reused by scrapes for that many
+    seconds, for callbacks that query storage.
+    """
+
+    def __init__(self, name, help, callback=None, max_age=0):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.max_age = max_age
+        self._values = {}
+        self._cached = None
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def _read_callback(self):
+        now = time.monotonic()
+        cached = self._cached
+        if cached is not None and now - cached[0] < self.max_age:
+            return cached[1]
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        if self.max_age:
+            self._cached = (now, values)
+        return values
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        if self.callback is not None:
+            values = self._read_callback()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, count, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f"{self.name}_bucket{_labels(key + (('le', bound),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', '+Inf'),))} {count}")
+                lines.append(f"{self.name}_count{_labels(key)} {count}")
+                lines.append(f"{self.name}_sum{_labels(key)} {total}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help):
+        return self._metrics.get(name) or self.register(Counter(name, help))
+
+    def gauge(self, name, help, callback=None, max_age=0):
+        gauge = self._metrics.get(name)
+        if gauge is None:
+            return self.register(Gauge(name, help, callback, max_age))
+        if callback is not None:
+            # Re-registered, e.g. by a re-imported app: read the new objects, not the old ones
+            gauge.callback = callback
+            gauge.max_age = max_age
+            gauge._cached = None
+        return gauge
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        return self._metrics.get(name) or self.register(Histogram(name, help, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STORAGE_CALLS = REGISTRY.counter("serveq_storage_calls_total", "Storage I/O operations")
+STORAGE_BYTES = REGISTRY.counter("serveq_storage_bytes_total", "Bytes read or written by storage I/O")
+STORAGE_SECONDS = REGISTRY.counter("serveq_storage_seconds_total", "Time spent in storage I/O")
+
+
+def record_io(op, target, nbytes, seconds):
+    """Account one storage operation, e.g. record_io("write", "journal", 120, 0.0004)."""
+    STORAGE_CALLS.inc(op=op, target=target)
+    STORAGE_BYTES.inc(nbytes, op=op, target=target)
+    STORAGE_SECONDS.inc(seconds, op=op, target=target)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and in-flight requests.
+
+    Requests are labelled with the matched route template (``/api/slots``,
+    not ``/api/slots?date=...``), so label cardinality stays bounded.
+    """
+
+    def __init__(self, app, registry=REGISTRY):
+        self.app = app
+        self.latency = registry.histogram("serveq_http_request_duration_seconds", "HTTP request latency")
+        self.in_flight = registry.gauge("serveq_http_requests_in_flight", "HTTP requests being served")
+        self.responses = registry.counter("serveq_http_responses_total", "HTTP responses by route and status")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.in_flight.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            self.latency.observe(elapsed, method=scope["method"], route=path)
+            self.responses.inc(method=scope["method"], route=path, status=status_code)
+
+
+class SamplingProfiler:
+    """Low-overhead statistical profiler that can be switched on in production.
+
+    A daemon thread snapshots every other thread's stack each ``interval``
+    seconds and counts collapsed stacks (``outer;inner;leaf``), which can be
+    fed straight into a flame graph tool.
+    """
+
+    def __init__(self, interval=0.01, max_depth=40):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = collections.Counter()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, interval=None):
+        if interval:
+            self.interval = interval
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                self.samples += 1
+                for ident, frame in frames.items():
+                    if ident == own:
+                        continue
+                    stack = []
+                    while frame is not None and len(stack) < self.max_depth:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    self._stacks[";".join(reversed(stack))] += 1
+
+    def top(self, limit=50):
+        with self._lock:
+            return {
+                "running": self.running,
+                "interval": self.interval,
+                "samples": self.samples,
+                "stacks": [{"stack": s, "count": n} for s, n in self._stacks.most_common(limit)]
+            }
@@ -1,4 +1,199 @@
+import heapq
+import json
 import random
+import sqlite3
+import threading
+import time
+
 
 def generate_otp():
     return str(random.randint(100000, 999999))
+
+
+class MemoryOtpStore:
+    """Per-process OTP records with a hard capacity; only valid with a single worker.
+
+    Expiry times sit in a min-heap that is swept on every insert, so abandoned
+    logins are dropped as soon as they expire. When the store is full the
+    record closest to expiry is evicted. Heap entries for replaced records are
+    skipped lazily and the heap is rebuilt once stale entries dominate it.
+    """
+
+    def __init__(self, capacity=100000, max_attempts=5):
+        self.capacity = capacity
+        self.max_attempts = max_attempts
+        self.evictions = 0
+        self.expirations = 0
+        self.failed_attempts = 0
+        self._records = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def _live(self, entry):
+        expires_at, email = entry
+        record = self._records.get(email)
+        return record is not None and record["expires_at"] == expires_at
+
+    def _sweep(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if self._live(entry):
+                del self._records[entry[1]]
+                self.expirations += 1
+
+    def _evict(self):
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            if self._live(entry):
+                del self._records[entry[1]]
+                self.evictions += 1
+                return
+
+    def put(self, email, record):
+        with self._lock:
+            self._sweep(time.time())
+            if email not in self._records and len(self._records) >= self.capacity:
+                self._evict()
+
+            self._records[email] = {**record, "attempts": 0}
+            heapq.heappush(self._heap, (record["expires_at"], email))
+            if len(self._heap) > 2 * len(self._records) + 64:
+                self._heap = [(r["expires_at"], e) for e, r in self._records.items()]
+                heapq.heapify(self._heap)
+
+    def get(self, email):
+        return self._records.get(email)
+
+    def pop(self, email):
+        with self._lock:
+            return self._records.pop(email, None)
+
+    def fail(self, email):
+        """Count a wrong OTP; the record is discarded once max_attempts is reached."""
+        with self._lock:
+            self.failed_attempts += 1
+            record = self._records.get(email)
+            if record is None:
+                return self.max_attempts
+            record["attempts"] += 1
+            if record["attempts"] >= self.max_attempts:
+                del self._records[email]
+            return record["attempts"]
+
+    def stats(self):
+        return {
+            "size": len(self._records),
+            "capacity": self.capacity,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "failed_attempts": self.failed_attempts
+        }
+
+    def __len__(self):
+        return len(self._records)
+
+
+class SqliteOtpStore:
+    """OTP records in a SQLite table so every uvicorn worker sees the same OTPs.
+
+    Like MemoryOtpStore, expired rows are swept on every insert (through an
+    index on ``expires_at``) and, once ``capacity`` rows are stored, the rows
+    closest to expiry are evicted. The counters in ``stats`` are per process.
+    """
+
+    def __init__(self, db_path, capacity=100000, max_attempts=5):
+        self.db_path = db_path
+        self.capacity = capacity
+        self.max_attempts = max_attempts
+        self.evictions = 0
+        self.expirations = 0
+        self.failed_attempts = 0
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS otps "
+                "(email TEXT PRIMARY KEY, record TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_otps_expires_at ON otps (expires_at)")
+            self._local.conn = conn
+        return conn
+
+    def put(self, email, record):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = conn.execute("DELETE FROM otps WHERE expires_at < ?", (time.time(),)).rowcount
+            conn.execute(
+                "INSERT OR REPLACE INTO otps (email, record, expires_at) VALUES (?, ?, ?)",
+                (email, json.dumps({**record, "attempts": 0}), record["expires_at"])
+            )
+            excess = conn.execute("SELECT COUNT(*) FROM otps").fetchone()[0] - self.capacity
+            evicted = 0
+            if excess > 0:
+                evicted = conn.execute(
+                    "DELETE FROM otps WHERE email IN "
+                    "(SELECT email FROM otps WHERE email != ? ORDER BY expires_at LIMIT ?)",
+                    (email, excess)
+                ).rowcount
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        self.expirations += expired
+        self.evictions += evicted
+
+    def get(self, email):
+        row = self._conn().execute("SELECT record FROM otps WHERE email = ?", (email,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def pop(self, email):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT record FROM otps WHERE email = ?", (email,)).fetchone()
+            conn.execute("DELETE FROM otps WHERE email = ?", (email,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return json.loads(row[0]) if row else None
+
+    def fail(self, email):
+        """Count a wrong OTP; the record is discarded once max_attempts is reached."""
+        self.failed_attempts += 1
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT record FROM otps WHERE email = ?", (email,)).fetchone()
+            if row is None:
+                attempts = self.max_attempts
+            else:
+                record = json.loads(row[0])
+                attempts = record["attempts"] = record.get("attempts", 0) + 1
+                if attempts >= self.max_attempts:
+                    conn.execute("DELETE FROM otps WHERE email = ?", (email,))
+                else:
+                    conn.execute("UPDATE otps SET record = ? WHERE email = ?", (json.dumps(record), email))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return attempts
+
+    def stats(self):
+        return {
+            "size": len(self),
+            "capacity": self.capacity,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "failed_attempts": self.failed_attempts
+        }
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM otps").fetchone()[0]
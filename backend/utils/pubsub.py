@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import threading
+
+from utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    def __init__(self, topics, maxsize):
+        self.topics = topics
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+
+class PubSubHub:
+    """In-process topic fan-out for server-sent events.
+
+    Each subscriber gets a bounded queue. Publishing never waits: a subscriber
+    whose queue is full is too slow to keep up and is disconnected instead of
+    buffering without limit. ``publish`` is safe to call from worker threads;
+    delivery always happens on the event loop.
+    """
+
+    def __init__(self, queue_size=32):
+        self.queue_size = queue_size
+        self._topics = {}
+        self._loop = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    def subscribe(self, topics):
+        subscriber = Subscriber(topics, self.queue_size)
+        with self._lock:
+            for topic in topics:
+                self._topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            for topic in subscriber.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._topics[topic]
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({s for subscribers in self._topics.values() for s in subscribers})
+
+    def publish(self, topic, event, data):
+        if self._loop is None or topic not in self._topics:
+            return
+        message = f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+        self._loop.call_soon_threadsafe(self._deliver, topic, message)
+
+    def _deliver(self, topic, message):
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Make room for the sentinel so the stream notices and ends
+                subscriber.dropped = True
+                self.dropped += 1
+                self.unsubscribe(subscriber)
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(None)
+                logger.warning("Dropped slow event subscriber on %s", topic)
+
+    async def stream(self, subscriber, request, keepalive=15.0):
+        """Yield SSE frames for a subscriber until the client leaves or is dropped."""
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
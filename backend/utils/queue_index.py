@@ -0,0 +1,66 @@
+import bisect
+import threading
+import time
+
+
+class QueueIndex:
+    """Per-day sorted slot starts of ACTIVE bookings, for queue position lookups.
+
+    Bookings are inserted with ``bisect.insort`` as they are made, so a
+    position is two binary searches regardless of how many bookings a day has.
+    Like AvailabilityEngine, a day is reloaded from storage after
+    ``refresh_after`` seconds when other workers also write bookings.
+    """
+
+    def __init__(self, repository, refresh_after=0):
+        self.repository = repository
+        self.refresh_after = refresh_after
+        self._lock = threading.Lock()
+        self._days = {}
+        self._loaded_at = {}
+
+    def rebuild(self, bookings):
+        days = {}
+        for booking in bookings:
+            days.setdefault(booking["slot_start"][:10], []).append(booking["slot_start"])
+        for starts in days.values():
+            starts.sort()
+        with self._lock:
+            self._days = days
+            self._loaded_at = {}
+
+    def add(self, booking):
+        with self._lock:
+            bisect.insort(self._days.setdefault(booking["slot_start"][:10], []), booking["slot_start"])
+
+    def remove(self, booking):
+        with self._lock:
+            starts = self._days.get(booking["slot_start"][:10], [])
+            i = bisect.bisect_left(starts, booking["slot_start"])
+            if i < len(starts) and starts[i] == booking["slot_start"]:
+                del starts[i]
+
+    def prune(self, before):
+        with self._lock:
+            for index in (self._days, self._loaded_at):
+                for date in [d for d in index if d < before]:
+                    del index[date]
+
+    def _starts(self, date):
+        if self.refresh_after and time.monotonic() - self._loaded_at.get(date, 0) > self.refresh_after:
+            starts = sorted(b["slot_start"] for b in self.repository.active_bookings_on(date))
+            with self._lock:
+                self._days[date] = starts
+                self._loaded_at[date] = time.monotonic()
+        return self._days.get(date, [])
+
+    def ahead_of(self, slot_start, served_before):
+        """Bookings on the same day starting before ``slot_start`` and after ``served_before``.
+
+        Both arguments are IST ISO strings, which sort chronologically.
+        """
+        starts = self._starts(slot_start[:10])
+        with self._lock:
+            mine = bisect.bisect_left(starts, slot_start)
+            served = bisect.bisect_right(starts, served_before)
+        return max(mine - served, 0)
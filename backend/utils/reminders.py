@@ -0,0 +1,141 @@
+import asyncio
+import heapq
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+REMINDER_NAMESPACE = uuid.UUID("5f1c7f4e-8d2a-4c55-9a55-1f6f3b0e7a10")
+
+
+def reminder_id(booking_id):
+    # Deterministic, so a reminder can never be stored twice for one booking
+    return str(uuid.uuid5(REMINDER_NAMESPACE, booking_id))
+
+
+class ReminderScheduler:
+    """Emits one REMINDER notification per ACTIVE booking, ``lead`` seconds before it starts.
+
+    Upcoming bookings sit in a heap ordered by reminder time; an asyncio task
+    sleeps until the earliest one is due. ``schedule`` may be called from any
+    thread. With ``resync_interval`` set, upcoming bookings are periodically
+    reloaded from storage so bookings made by other workers get reminders too.
+    Listeners registered with ``add_listener`` receive each new reminder.
+    """
+
+    def __init__(self, repository, now, lead=600, resync_interval=0):
+        self.repository = repository
+        self.now = now
+        self.lead = lead
+        self.resync_interval = resync_interval
+        self._heap = []
+        self._scheduled = set()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+        self._listeners = []
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def schedule(self, booking):
+        try:
+            start = datetime.fromisoformat(booking["slot_start"]).timestamp()
+        except Exception as e:
+            logger.warning("Failed to parse slot time for booking %s: %s", booking.get("id"), e)
+            return
+        if start < time.time():
+            return
+
+        with self._lock:
+            if booking["id"] in self._scheduled:
+                return
+            self._scheduled.add(booking["id"])
+            heapq.heappush(self._heap, (start - self.lead, start, booking["id"], booking["email"]))
+
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def load(self):
+        for booking in self.repository.active_bookings():
+            self.schedule(booking)
+
+    def _emit(self, booking_id, email):
+        notification_id = reminder_id(booking_id)
+        if self.repository.get_notification(notification_id):
+            return False
+        booking = self.repository.get_booking(booking_id)
+        if booking is None or booking["status"] != "ACTIVE":
+            # Cancelled since it was scheduled
+            return False
+        notification = {
+            "id": notification_id,
+            "email": email,
+            "message": "Your appointment is in 10 minutes",
+            "type": "REMINDER",
+            "created_at": self.now().isoformat(),
+            "cleared": False
+        }
+        self.repository.add_notification(notification)
+        logger.info("Reminder created for %s", email)
+
+        for callback in self._listeners:
+            callback(notification)
+        return True
+
+    def _due(self):
+        now = time.time()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, start, booking_id, email = heapq.heappop(self._heap)
+                self._scheduled.discard(booking_id)
+                if start >= now:
+                    due.append((booking_id, email))
+            next_at = self._heap[0][0] if self._heap else None
+        return due, next_at
+
+    async def _run(self):
+        last_resync = time.monotonic()
+        while True:
+            if self.resync_interval and time.monotonic() - last_resync >= self.resync_interval:
+                await asyncio.to_thread(self.load)
+                last_resync = time.monotonic()
+
+            # Clear before draining so a booking scheduled meanwhile still wakes us
+            self._wakeup.clear()
+            due, next_at = self._due()
+            for booking_id, email in due:
+                try:
+                    # Repository writes may block on fsync or SQLite; keep them off the loop
+                    await asyncio.to_thread(self._emit, booking_id, email)
+                except Exception as e:
+                    logger.error("Failed to create reminder for booking %s: %s", booking_id, e)
+
+            timeout = None if next_at is None else max(next_at - time.time(), 0)
+            if self.resync_interval:
+                timeout = self.resync_interval if timeout is None else min(timeout, self.resync_interval)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
@@ -0,0 +1,525 @@
+import logging
+import os
+import threading
+import time
+from itertools import islice
+
+from utils.journal import Journal
+from utils.metrics import record_io
+from utils.serialization import check_format, decode, detect, dumps, encode
+
+logger = logging.getLogger(__name__)
+
+
+class BookingConflict(Exception):
+    """Raised when a booking would overfill a slot or give a user a second active booking."""
+
+
+class SlotTaken(BookingConflict):
+    """Raised when the seat a booking asked for in its slot already has an active booking."""
+
+
+class JsonRepository:
+    """In-memory users, bookings and notifications backed by the data/*.json files.
+
+    Everything is loaded once at startup and served from hash indexes. Each
+    mutation is appended to a journal (one line per change, fsync'd in group
+    commits) and a background thread periodically compacts the journal into
+    fresh JSON snapshots, which are swapped in atomically.
+
+    Only live records stay in memory and in the snapshots: ``archive`` moves
+    bookings for past days and cleared notifications into append-only
+    per-month segments under ``data/archive/``, which ``history`` reads back.
+
+    Snapshots are written in ``snapshot_format`` (see ``SNAPSHOT_FORMATS``).
+    Existing files are read in whatever format they were written in, and are
+    rewritten in the configured one at load.
+    """
+
+    def __init__(self, data_dir, compact_entries=5000, compact_interval=60.0, snapshot_format="pretty"):
+        self.users_file = data_dir / "users.json"
+        self.bookings_file = data_dir / "bookings.json"
+        self.notifications_file = data_dir / "notifications.json"
+        self.meta_file = data_dir / "meta.json"
+        self.journal_file = data_dir / "journal.log"
+        self.rotated_journal_file = data_dir / "journal.log.1"
+        self.archive_dir = data_dir / "archive"
+        self.compact_entries = compact_entries
+        self.compact_interval = compact_interval
+        check_format(snapshot_format)
+        self.snapshot_format = snapshot_format
+
+        self.journal = Journal(self.journal_file)
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._archive_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._compactor = None
+        self._reset()
+
+    def _reset(self):
+        # Insertion-ordered dicts double as the primary record lists
+        self._users_by_email = {}
+        self._bookings_by_id = {}
+        self._active_by_email = {}
+        # slot_start -> {seat: booking}
+        self._active_by_slot = {}
+        self._notifications_by_id = {}
+        # email -> {id: notification} in seq (creation) order
+        self._pending_by_email = {}
+        self._pending_count = 0
+        self._notification_seq = 0
+
+    # ---------------- LOADING ---------------- #
+
+    def _read(self, file, default=list):
+        """Decoded contents of ``file``, or ``default()`` when it is missing or empty."""
+        if not file.exists():
+            return default()
+        started = time.perf_counter()
+        with open(file, "rb") as f:
+            raw = f.read()
+        data = decode(raw)
+        record_io("read", "snapshot", len(raw), time.perf_counter() - started)
+        if data is None:
+            return default()
+        if data and detect(raw) != self.snapshot_format:
+            self._migrate = True
+        return data
+
+    def load(self):
+        """Load the snapshots, replay any journal left behind and compact it away."""
+        with self._lock:
+            self._reset()
+            self._migrate = False
+            self._notification_seq = self._read(self.meta_file, dict).get("notification_seq", 0)
+            for user in self._read(self.users_file):
+                self._index_user(user)
+            for booking in self._read(self.bookings_file):
+                self._index_booking(booking)
+            for notification in self._read(self.notifications_file):
+                self._index_notification(notification)
+
+            replayed = 0
+            for file in (self.rotated_journal_file, self.journal_file):
+                for entry in Journal.replay(file):
+                    self._apply(entry)
+                    replayed += 1
+
+            if replayed:
+                logger.info("Replayed %s journal entries", replayed)
+            if self._migrate:
+                logger.info("Rewriting snapshots in %s format", self.snapshot_format)
+            if replayed or self._migrate:
+                self._write_snapshots(self._snapshot())
+            for file in (self.rotated_journal_file, self.journal_file):
+                file.unlink(missing_ok=True)
+            self.journal.open()
+
+        logger.info(
+            "Repository loaded: %s users, %s bookings, %s notifications",
+            len(self._users_by_email), len(self._bookings_by_id), len(self._notifications_by_id)
+        )
+
+    def _index_user(self, user):
+        self._users_by_email[user["email"]] = user
+
+    def _index_booking(self, booking):
+        previous = self._bookings_by_id.get(booking["id"])
+        if previous is not None and previous["status"] == "ACTIVE":
+            self._drop_active(previous)
+
+        self._bookings_by_id[booking["id"]] = booking
+        if booking["status"] == "ACTIVE":
+            self._active_by_email[booking["email"]] = booking
+            self._active_by_slot.setdefault(booking["slot_start"], {})[booking.get("seat", 0)] = booking
+
+    def _drop_active(self, booking):
+        if self._active_by_email.get(booking["email"]) is booking:
+            del self._active_by_email[booking["email"]]
+        seats = self._active_by_slot.get(booking["slot_start"])
+        if seats is not None and seats.get(booking.get("seat", 0)) is booking:
+            del seats[booking.get("seat", 0)]
+            if not seats:
+                del self._active_by_slot[booking["slot_start"]]
+
+    def _unindex_booking(self, booking_id):
+        booking = self._bookings_by_id.pop(booking_id, None)
+        if booking is not None and booking["status"] == "ACTIVE":
+            self._drop_active(booking)
+
+    def _index_notification(self, notification):
+        if "seq" not in notification:
+            # Written before notifications had sequence numbers
+            notification = {**notification, "seq": self._notification_seq + 1}
+        self._notification_seq = max(self._notification_seq, notification["seq"])
+        self._notifications_by_id[notification["id"]] = notification
+        pending = self._pending_by_email.setdefault(notification["email"], {})
+        if notification["cleared"]:
+            if pending.pop(notification["id"], None) is not None:
+                self._pending_count -= 1
+        else:
+            if notification["id"] not in pending:
+                self._pending_count += 1
+            pending[notification["id"]] = notification
+
+    def _unindex_notification(self, notification_id):
+        notification = self._notifications_by_id.pop(notification_id, None)
+        if notification is not None:
+            if self._pending_by_email.get(notification["email"], {}).pop(notification_id, None) is not None:
+                self._pending_count -= 1
+
+    def _apply(self, entry):
+        op = entry["op"]
+        if op == "user":
+            self._index_user(entry["data"])
+        elif op == "booking":
+            self._index_booking(entry["data"])
+        elif op == "notification":
+            self._index_notification(entry["data"])
+        elif op == "clear":
+            notification = self._notifications_by_id.get(entry["id"])
+            if notification is not None:
+                self._index_notification({**notification, "cleared": True})
+        elif op == "batch":
+            for child in entry["entries"]:
+                self._apply(child)
+        elif op == "archive":
+            for booking_id in entry["bookings"]:
+                self._unindex_booking(booking_id)
+            for notification_id in entry["notifications"]:
+                self._unindex_notification(notification_id)
+        else:
+            logger.error("Unknown journal operation: %s", op)
+
+    def _write(self, entry):
+        """Apply a mutation in memory and append it to the journal; the caller holds the lock."""
+        self._apply(entry)
+        return self.journal.write(entry)
+
+    def _write_batch(self, entries):
+        """Journal entries the caller already applied as one line, so the batch replays all or nothing."""
+        return self.journal.write({"op": "batch", "entries": entries})
+
+    def _commit(self, entry):
+        """Apply a mutation in memory and make it durable in the journal."""
+        with self._lock:
+            seq = self._write(entry)
+        self.journal.sync(seq)
+
+    def counts(self):
+        return {
+            "users": len(self._users_by_email),
+            "bookings": len(self._bookings_by_id),
+            "active_bookings": len(self._active_by_email),
+            "notifications": len(self._notifications_by_id)
+        }
+
+    # ---------------- USERS ---------------- #
+
+    def get_user(self, email):
+        return self._users_by_email.get(email)
+
+    def save_user(self, user):
+        self._commit({"op": "user", "data": user})
+
+    # ---------------- BOOKINGS ---------------- #
+
+    def get_booking(self, booking_id):
+        return self._bookings_by_id.get(booking_id)
+
+    def get_active_booking(self, email):
+        return self._active_by_email.get(email)
+
+    def bookings_at(self, slot_start):
+        with self._lock:
+            return list(self._active_by_slot.get(slot_start, {}).values())
+
+    def active_bookings(self):
+        with self._lock:
+            return list(self._active_by_email.values())
+
+    def active_bookings_on(self, date):
+        with self._lock:
+            return [b for b in self._active_by_email.values() if b["slot_start"].startswith(date)]
+
+    def _check_booking(self, booking):
+        if booking.get("seat", 0) in self._active_by_slot.get(booking["slot_start"], {}):
+            raise SlotTaken("Slot already booked")
+        if booking["email"] in self._active_by_email:
+            raise BookingConflict("User already has an active booking")
+
+    def add_booking(self, booking):
+        with self._lock:
+            self._check_booking(booking)
+            seq = self._write({"op": "booking", "data": booking})
+        self.journal.sync(seq)
+
+    def add_bookings(self, bookings):
+        """Store a batch of bookings in one journal entry; returns None or the BookingConflict for each."""
+        errors = []
+        entries = []
+        with self._lock:
+            for booking in bookings:
+                try:
+                    self._check_booking(booking)
+                except BookingConflict as e:
+                    errors.append(e)
+                    continue
+                entry = {"op": "booking", "data": booking}
+                self._apply(entry)
+                entries.append(entry)
+                errors.append(None)
+            seq = self._write_batch(entries) if entries else 0
+        if seq:
+            self.journal.sync(seq)
+        return errors
+
+    def cancel_bookings(self, booking_ids):
+        """Cancel ACTIVE bookings in one journal entry; returns {id: cancelled booking or None}."""
+        results = {}
+        entries = []
+        with self._lock:
+            for booking_id in booking_ids:
+                booking = self._bookings_by_id.get(booking_id)
+                if booking is None or booking["status"] != "ACTIVE":
+                    results[booking_id] = None
+                    continue
+                entry = {"op": "booking", "data": {**booking, "status": "CANCELLED"}}
+                self._apply(entry)
+                entries.append(entry)
+                results[booking_id] = entry["data"]
+            seq = self._write_batch(entries) if entries else 0
+        if seq:
+            self.journal.sync(seq)
+        return results
+
+    # ---------------- NOTIFICATIONS ---------------- #
+
+    def get_notification(self, notification_id):
+        return self._notifications_by_id.get(notification_id)
+
+    def pending_count(self):
+        return self._pending_count
+
+    def pending_notifications(self, email, since=0, limit=None):
+        """Uncleared notifications of ``email`` with seq above ``since``, oldest first."""
+        with self._lock:
+            pending = self._pending_by_email.get(email, {})
+            if not since:
+                newer = list(islice(pending.values(), limit))
+            else:
+                # Walk back from the newest, so an up-to-date poll stops at the first entry
+                newer = []
+                for notification in reversed(pending.values()):
+                    if notification["seq"] <= since:
+                        break
+                    newer.append(notification)
+                newer.reverse()
+        return newer if limit is None else newer[:limit]
+
+    def add_notification(self, notification):
+        with self._lock:
+            existing = self._notifications_by_id.get(notification["id"])
+            seq = existing["seq"] if existing is not None else self._notification_seq + 1
+            entry_seq = self._write({"op": "notification", "data": {**notification, "seq": seq}})
+        self.journal.sync(entry_seq)
+
+    def clear_notification(self, notification_id):
+        with self._lock:
+            if notification_id not in self._notifications_by_id:
+                return False
+            seq = self._write({"op": "clear", "id": notification_id})
+        self.journal.sync(seq)
+        return True
+
+    def clear_notifications(self, notification_ids):
+        """Clear several notifications in one journal entry; returns {id: found}."""
+        results = {}
+        entries = []
+        with self._lock:
+            for notification_id in notification_ids:
+                results[notification_id] = notification_id in self._notifications_by_id
+                if results[notification_id]:
+                    entry = {"op": "clear", "id": notification_id}
+                    self._apply(entry)
+                    entries.append(entry)
+            seq = self._write_batch(entries) if entries else 0
+        if seq:
+            self.journal.sync(seq)
+        return results
+
+    def clear_all_notifications(self, email):
+        """Clear every pending notification of ``email``; returns the cleared ids."""
+        with self._lock:
+            ids = list(self._pending_by_email.get(email, {}))
+            entries = [{"op": "clear", "id": notification_id} for notification_id in ids]
+            for entry in entries:
+                self._apply(entry)
+            seq = self._write_batch(entries) if entries else 0
+        if seq:
+            self.journal.sync(seq)
+        return ids
+
+    # ---------------- ARCHIVE ---------------- #
+
+    def _append_segments(self, kind, records, month_of):
+        months = {}
+        for record in records:
+            months.setdefault(month_of(record), []).append(record)
+
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        for month, batch in months.items():
+            started = time.perf_counter()
+            data = b"".join(dumps(r) + b"\n" for r in batch)
+            with open(self.archive_dir / f"{kind}-{month}.jsonl", "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            record_io("write", "archive", len(data), time.perf_counter() - started)
+
+    def archive(self, before):
+        """Move bookings for days before ``before`` (YYYY-MM-DD), and cleared
+        notifications created before that day, out of the hot set.
+
+        Records are appended to their month's segment first and only then
+        dropped from memory through an ``archive`` journal entry, so a crash in
+        between leaves a duplicate in the archive rather than losing a record.
+        Returns the number of bookings and notifications moved.
+        """
+        with self._archive_lock:
+            with self._lock:
+                bookings = [b for b in self._bookings_by_id.values() if b["slot_start"] < before]
+                notifications = [
+                    n for n in self._notifications_by_id.values() if n["cleared"] and n["created_at"] < before
+                ]
+            if not bookings and not notifications:
+                return 0, 0
+
+            self._append_segments("bookings", bookings, lambda b: b["slot_start"][:7])
+            self._append_segments("notifications", notifications, lambda n: n["created_at"][:7])
+
+            with self._lock:
+                # A record replaced since the scan stays hot; the next run archives its new version
+                entry = {
+                    "op": "archive",
+                    "bookings": [b["id"] for b in bookings if self._bookings_by_id.get(b["id"]) is b],
+                    "notifications": [
+                        n["id"] for n in notifications if self._notifications_by_id.get(n["id"]) is n
+                    ]
+                }
+                seq = self._write(entry)
+            self.journal.sync(seq)
+
+        self.compact()
+        logger.info(
+            "Archived %s bookings and %s notifications from before %s",
+            len(entry["bookings"]), len(entry["notifications"]), before
+        )
+        return len(entry["bookings"]), len(entry["notifications"])
+
+    def _read_segments(self, kind, email, start, end):
+        records = {}
+        for file in sorted(self.archive_dir.glob(f"{kind}-*.jsonl")):
+            month = file.stem[len(kind) + 1:]
+            if (start and month < start) or (end and month > end):
+                continue
+            started = time.perf_counter()
+            for record in Journal.replay(file):
+                if record["email"] == email:
+                    # A segment may repeat a record after an interrupted archive run; the last copy wins
+                    records[record["id"]] = record
+            record_io("read", "archive", file.stat().st_size, time.perf_counter() - started)
+        return list(records.values())
+
+    def history(self, email, start=None, end=None):
+        """Archived bookings and notifications of ``email``, optionally limited to YYYY-MM months."""
+        bookings = self._read_segments("bookings", email, start, end)
+        notifications = self._read_segments("notifications", email, start, end)
+        return {
+            "bookings": sorted(bookings, key=lambda b: b["slot_start"]),
+            "notifications": sorted(notifications, key=lambda n: n["created_at"])
+        }
+
+    def scan_bookings(self):
+        """(slot_start, status) of every booking, live and archived."""
+        facts = {}
+        # Hold off archiving, so no booking is between the segments and the hot set
+        with self._archive_lock:
+            for file in sorted(self.archive_dir.glob("bookings-*.jsonl")):
+                for record in Journal.replay(file):
+                    facts[record["id"]] = (record["slot_start"], record["status"])
+            with self._lock:
+                for booking in self._bookings_by_id.values():
+                    facts[booking["id"]] = (booking["slot_start"], booking["status"])
+        return list(facts.values())
+
+    # ---------------- COMPACTION ---------------- #
+
+    def _snapshot(self):
+        return {
+            self.users_file: list(self._users_by_email.values()),
+            self.bookings_file: list(self._bookings_by_id.values()),
+            self.notifications_file: list(self._notifications_by_id.values()),
+            # Archiving may drop the newest notification; keep its seq so it is never reused
+            self.meta_file: {"notification_seq": self._notification_seq},
+        }
+
+    def _write_snapshots(self, snapshots):
+        for file, data in snapshots.items():
+            started = time.perf_counter()
+            tmp = file.with_name(file.name + ".tmp")
+            with open(tmp, "wb") as f:
+                f.write(encode(data, self.snapshot_format))
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            os.replace(tmp, file)
+            record_io("write", "snapshot", size, time.perf_counter() - started)
+
+    def compact(self):
+        """Fold the journal into new snapshot files.
+
+        The journal is rotated under the repository lock so the snapshot and
+        the rotated log describe the same state; until the snapshots are in
+        place the rotated log is kept, and replaying it is idempotent.
+        """
+        with self._compact_lock:
+            with self._lock:
+                if not self.journal.entries:
+                    return
+                entries = self.journal.entries
+                # Records are replaced rather than mutated, so a shallow copy is a stable view
+                snapshots = self._snapshot()
+                self.journal.rotate(self.rotated_journal_file)
+
+            try:
+                self._write_snapshots(snapshots)
+            except Exception as e:
+                logger.error("Snapshot compaction failed, keeping rotated journal: %s", e)
+                return
+            self.rotated_journal_file.unlink(missing_ok=True)
+            logger.info("Compacted %s journal entries into snapshots", entries)
+
+    def _compact_loop(self):
+        waited = 0.0
+        while not self._stop.wait(1.0):
+            waited += 1.0
+            if self.journal.entries >= self.compact_entries or (
+                waited >= self.compact_interval and self.journal.entries
+            ):
+                self.compact()
+                waited = 0.0
+
+    def start(self):
+        self._stop.clear()
+        self._compactor = threading.Thread(target=self._compact_loop, name="repository-compactor", daemon=True)
+        self._compactor.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+        self.compact()
+        self.journal.close()
@@ -0,0 +1,121 @@
+import bisect
+from datetime import date as Date, datetime, timedelta
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def _minutes(value):
+    hours, minutes = map(int, value.split(":"))
+    return hours * 60 + minutes
+
+
+def _label(minute):
+    return (datetime(2000, 1, 1) + timedelta(minutes=minute)).strftime("%I:%M %p")
+
+
+class Slot:
+    __slots__ = ("minute", "start", "end", "seats")
+
+    def __init__(self, minute, start, end, seats):
+        self.minute = minute
+        self.start = start
+        self.end = end
+        # Counter id serving each seat; the slot's capacity is len(seats)
+        self.seats = seats
+
+    @property
+    def capacity(self):
+        return len(self.seats)
+
+
+class Schedule:
+    """Service counters and their opening hours, expanded into one slot template per weekday.
+
+    ``working_hours`` in slots.json gives the default hours and the slot
+    interval. ``weekly_hours`` overrides the hours for individual weekdays
+    (``null`` closes that day), and ``counters`` lists the service counters,
+    each with an optional ``name``, ``capacity`` (bookings it serves per slot,
+    default 1) and its own ``weekly_hours``. Without ``counters`` there is one
+    counter of capacity 1, i.e. one booking per slot.
+
+    A slot's capacity is the combined capacity of the counters open at that
+    time. Every unit of capacity is a numbered seat belonging to one counter,
+    which is what a booking actually reserves.
+    """
+
+    def __init__(self, config):
+        hours = config["working_hours"]
+        self.interval = int(hours["interval_minutes"])
+        if self.interval <= 0:
+            raise ValueError("interval_minutes must be positive")
+
+        default_hours = {day: hours for day in WEEKDAYS}
+        default_hours.update(self._weekly(config))
+
+        counters = config.get("counters") or [{"id": "1"}]
+        self.counters = {}
+        for counter in counters:
+            counter_id = str(counter["id"])
+            if counter_id in self.counters:
+                raise ValueError(f"Duplicate counter id: {counter_id}")
+            self.counters[counter_id] = counter.get("name", f"Counter {counter_id}")
+
+        # Every counter's slots sit on one grid anchored at the default start time
+        anchor = _minutes(hours["start"]) % self.interval
+        self.templates = []
+        for day in WEEKDAYS:
+            seats = {}
+            for counter in counters:
+                counter_hours = {**default_hours, **self._weekly(counter)}[day]
+                if not counter_hours:
+                    continue
+                start, end = _minutes(counter_hours["start"]), _minutes(counter_hours["end"])
+                minute = start + (anchor - start) % self.interval
+                while minute < end:
+                    seats.setdefault(minute, []).extend([str(counter["id"])] * int(counter.get("capacity", 1)))
+                    minute += self.interval
+
+            self.templates.append([
+                Slot(minute, _label(minute), _label(minute + self.interval), tuple(seats[minute]))
+                for minute in sorted(seats) if seats[minute]
+            ])
+
+        self._positions = [{slot.minute: i for i, slot in enumerate(t)} for t in self.templates]
+        self._start_seconds = [[slot.minute * 60 for slot in t] for t in self.templates]
+
+    @staticmethod
+    def _weekly(config):
+        weekly = config.get("weekly_hours") or {}
+        unknown = set(weekly) - set(WEEKDAYS)
+        if unknown:
+            raise ValueError(f"Unknown weekday in weekly_hours: {', '.join(sorted(unknown))}")
+        return weekly
+
+    def template(self, date):
+        """Slots of a YYYY-MM-DD date, in start order."""
+        return self.templates[Date.fromisoformat(date).weekday()]
+
+    def locate(self, slot_start):
+        """(date, template index) of an IST ISO slot start; the index is None off the schedule."""
+        date = slot_start[:10]
+        minute = int(slot_start[11:13]) * 60 + int(slot_start[14:16])
+        if int(slot_start[17:19]):
+            return date, None
+        return date, self._positions[Date.fromisoformat(date).weekday()].get(minute)
+
+    def seats(self, slot_start):
+        """Counter ids of the seats in a slot; empty when the slot is not on the schedule."""
+        date, index = self.locate(slot_start)
+        if index is None:
+            return ()
+        return self.template(date)[index].seats
+
+    def first_bookable(self, date, now):
+        """Index of the first slot of ``date`` that starts strictly after ``now``."""
+        today = now.strftime("%Y-%m-%d")
+        if date < today:
+            return len(self.template(date))
+        if date > today:
+            return 0
+        now_second = now.hour * 3600 + now.minute * 60 + now.second
+        return bisect.bisect_right(self._start_seconds[Date.fromisoformat(date).weekday()], now_second)
@@ -0,0 +1,78 @@
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# On-disk snapshot encodings: indented JSON (the original layout), minified JSON, msgpack
+SNAPSHOT_FORMATS = ("pretty", "compact", "msgpack")
+
+
+def check_format(fmt):
+    if fmt not in SNAPSHOT_FORMATS:
+        raise ValueError(f"Unknown snapshot format: {fmt}")
+    if fmt == "msgpack" and msgpack is None:
+        raise RuntimeError("The msgpack snapshot format needs the msgpack package")
+
+
+def dumps(obj):
+    """Minified JSON as bytes; uses orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def encode(obj, fmt):
+    if fmt == "pretty":
+        if orjson is not None:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode()
+    if fmt == "compact":
+        return dumps(obj)
+    check_format(fmt)
+    return msgpack.packb(obj)
+
+
+def detect(data):
+    """Snapshot format of ``data``, or None for an empty file. JSON always starts
+    with ``[`` or ``{``, while msgpack starts with a type byte, so no marker is needed."""
+    head = data.lstrip()[:1]
+    if not head:
+        return None
+    if head not in (b"[", b"{"):
+        return "msgpack"
+    return "pretty" if b"\n" in data.strip() else "compact"
+
+
+def decode(data):
+    """Decode a snapshot written in any of the ``SNAPSHOT_FORMATS``; None for an empty file."""
+    fmt = detect(data)
+    if fmt is None:
+        # Deploy scripts may create data files with touch
+        return None
+    if fmt == "msgpack":
+        if msgpack is None:
+            raise RuntimeError("Snapshot is msgpack-encoded but the msgpack package is not installed")
+        return msgpack.unpackb(data)
+    return loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """Default response class: same output as JSONResponse, encoded with orjson when available."""
+
+    def render(self, content):
+        return dumps(content)
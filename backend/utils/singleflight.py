@@ -0,0 +1,52 @@
+import asyncio
+import contextvars
+import functools
+
+from utils.metrics import REGISTRY
+
+COALESCED_READS = REGISTRY.counter(
+    "serveq_coalesced_reads_total",
+    "Coalesced read requests, by kind and by whether they ran the computation or joined one in flight"
+)
+
+
+class SingleFlight:
+    """Coalesces concurrent identical reads into one computation.
+
+    ``do(key, fn, *args)`` runs the blocking ``fn`` in ``executor`` unless a
+    call with the same key is already in flight, in which case it waits for
+    that call and shares its result (or exception). Keys are tuples whose
+    first item names the kind of read, used as the metrics label. Nothing is
+    cached: the key is forgotten as soon as the computation finishes, so a
+    later request always sees fresh data.
+
+    Must only be used from the event loop; the in-flight map needs no lock.
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self._calls = {}
+
+    async def do(self, key, fn, *args):
+        future = self._calls.get(key)
+        if future is None:
+            COALESCED_READS.inc(kind=key[0], role="leader")
+            # Run in the caller's context so log records keep its request id
+            call = functools.partial(contextvars.copy_context().run, fn, *args)
+            future = asyncio.get_running_loop().run_in_executor(self.executor, call)
+            self._calls[key] = future
+            future.add_done_callback(functools.partial(self._done, key))
+        else:
+            COALESCED_READS.inc(kind=key[0], role="joined")
+        # A waiter that disconnects must not cancel the computation for the others
+        return await asyncio.shield(future)
+
+    def _done(self, key, future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            # Mark the exception retrieved even if every waiter went away
+            future.exception()
+
+    def in_flight(self):
+        return len(self._calls)
@@ -0,0 +1,465 @@
+import logging
+import queue
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from utils.metrics import record_io
+from utils.repository import BookingConflict, SlotTaken
+from utils.serialization import decode
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    id TEXT NOT NULL,
+    username TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    last_login TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS bookings (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    slot_start TEXT NOT NULL,
+    slot_end TEXT NOT NULL,
+    status TEXT NOT NULL,
+    seat INTEGER NOT NULL DEFAULT 0,
+    counter TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS bookings_active_seat ON bookings (slot_start, seat) WHERE status = 'ACTIVE';
+CREATE UNIQUE INDEX IF NOT EXISTS bookings_active_email ON bookings (email) WHERE status = 'ACTIVE';
+
+CREATE TABLE IF NOT EXISTS notifications (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL,
+    message TEXT NOT NULL,
+    type TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    cleared INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS notifications_pending ON notifications (email, seq) WHERE cleared = 0;
+
+CREATE TABLE IF NOT EXISTS bookings_archive (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    slot_start TEXT NOT NULL,
+    slot_end TEXT NOT NULL,
+    status TEXT NOT NULL,
+    seat INTEGER NOT NULL DEFAULT 0,
+    counter TEXT,
+    month TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bookings_archive_email ON bookings_archive (email, month);
+
+CREATE TABLE IF NOT EXISTS notifications_archive (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    message TEXT NOT NULL,
+    type TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    cleared INTEGER NOT NULL,
+    month TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notifications_archive_email ON notifications_archive (email, month);
+"""
+
+USER_COLUMNS = ("id", "email", "username", "created_at", "last_login")
+BOOKING_COLUMNS = ("id", "email", "slot_start", "slot_end", "status", "seat", "counter")
+# Bookings made before multi-counter scheduling have no seat or counter
+BOOKING_DEFAULTS = {"seat": 0, "counter": None}
+NOTIFICATION_COLUMNS = ("id", "email", "message", "type", "created_at", "cleared")
+NOTIFICATION_FIELDS = NOTIFICATION_COLUMNS + ("seq",)
+
+
+def _select(table, columns):
+    return f"SELECT {', '.join(columns)} FROM {table}"
+
+
+def _insert(table, columns, verb="INSERT"):
+    return f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+
+
+def _booking_values(booking):
+    return tuple(booking.get(c, BOOKING_DEFAULTS.get(c)) for c in BOOKING_COLUMNS)
+
+
+class SqliteRepository:
+    """SQLite storage engine with the same operations as JsonRepository.
+
+    Runs in WAL mode so readers never block the writer, hands out connections
+    from a small pool, and lets unique indexes enforce one active booking per
+    seat of a slot and per email. ``archive`` moves past-day bookings and cleared
+    notifications into ``*_archive`` tables keyed by month, keeping the live
+    tables and their indexes small.
+    """
+
+    def __init__(self, db_path, pool_size=8, seed_dir=None):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.seed_dir = seed_dir
+        self._pool = queue.Queue()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        conn = self._pool.get()
+        started = time.perf_counter()
+        try:
+            yield conn
+        finally:
+            record_io("query", "sqlite", 0, time.perf_counter() - started)
+            self._pool.put(conn)
+
+    @contextmanager
+    def _transaction(self):
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    # ---------------- LIFECYCLE ---------------- #
+
+    def load(self):
+        fresh = not Path(self.db_path).exists()
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        while not self._pool.empty():
+            self._pool.get().close()
+        for _ in range(self.pool_size):
+            self._pool.put(self._connect())
+
+        with self._connection() as conn:
+            self._migrate(conn)
+            conn.executescript(SCHEMA)
+
+        if fresh and self.seed_dir is not None:
+            self.import_json(self.seed_dir)
+
+        with self._connection() as conn:
+            counts = {
+                table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("users", "bookings", "notifications")
+            }
+
+        logger.info(
+            "SQLite repository ready at %s: %s users, %s bookings, %s notifications",
+            self.db_path, counts["users"], counts["bookings"], counts["notifications"]
+        )
+
+    def _migrate(self, conn):
+        """Upgrade databases created before bookings had seats (one booking per slot)."""
+        for table in ("bookings", "bookings_archive"):
+            columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if columns and "seat" not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN seat INTEGER NOT NULL DEFAULT 0")
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN counter TEXT")
+                logger.info("Added seat and counter columns to %s", table)
+        conn.execute("DROP INDEX IF EXISTS bookings_active_slot")
+
+    def start(self):
+        pass
+
+    def stop(self):
+        with self._connection() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        while not self._pool.empty():
+            self._pool.get().close()
+
+    def compact(self):
+        with self._connection() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def import_json(self, data_dir):
+        """One-shot import of users/bookings/notifications.json into the database.
+
+        Bookings already in the database are updated by id. A booking that would
+        be a second ACTIVE one for its email or seat is skipped and logged
+        instead; returns the skipped ids.
+        """
+        data_dir = Path(data_dir)
+
+        def read(name):
+            file = data_dir / name
+            if not file.exists():
+                return []
+            with open(file, "rb") as f:
+                return decode(f.read()) or []
+
+        users = read("users.json")
+        bookings = read("bookings.json")
+        notifications = read("notifications.json")
+
+        with self._transaction() as conn:
+            conn.executemany(
+                _insert("users", USER_COLUMNS, "INSERT OR REPLACE"),
+                [tuple(u[c] for c in USER_COLUMNS) for u in users]
+            )
+            # INSERT OR REPLACE would delete whichever ACTIVE row a booking clashes with; skip it instead
+            upsert = _insert("bookings", BOOKING_COLUMNS) + " ON CONFLICT (id) DO UPDATE SET " + ", ".join(
+                f"{c} = excluded.{c}" for c in BOOKING_COLUMNS[1:]
+            )
+            skipped = []
+            for booking in bookings:
+                try:
+                    conn.execute(upsert, _booking_values(booking))
+                except sqlite3.IntegrityError:
+                    skipped.append(booking["id"])
+            conn.executemany(
+                _insert("notifications", NOTIFICATION_COLUMNS, "INSERT OR IGNORE"),
+                [tuple(n[c] for c in NOTIFICATION_COLUMNS) for n in notifications]
+            )
+
+        if skipped:
+            logger.warning(
+                "Skipped %s bookings that clash with an ACTIVE booking: %s",
+                len(skipped), ", ".join(skipped)
+            )
+        logger.info(
+            "Imported %s users, %s bookings and %s notifications from %s",
+            len(users), len(bookings) - len(skipped), len(notifications), data_dir
+        )
+        return skipped
+
+    def counts(self):
+        with self._connection() as conn:
+            return {
+                "users": conn.execute("SELECT COUNT(*) FROM users").fetchone()[0],
+                "bookings": conn.execute("SELECT COUNT(*) FROM bookings").fetchone()[0],
+                "active_bookings": conn.execute(
+                    "SELECT COUNT(*) FROM bookings WHERE status = 'ACTIVE'"
+                ).fetchone()[0],
+                "notifications": conn.execute("SELECT COUNT(*) FROM notifications").fetchone()[0]
+            }
+
+    # ---------------- USERS ---------------- #
+
+    def get_user(self, email):
+        with self._connection() as conn:
+            row = conn.execute(_select("users", USER_COLUMNS) + " WHERE email = ?", (email,)).fetchone()
+        return dict(row) if row else None
+
+    def save_user(self, user):
+        with self._connection() as conn:
+            conn.execute(
+                _insert("users", USER_COLUMNS, "INSERT OR REPLACE"),
+                tuple(user[c] for c in USER_COLUMNS)
+            )
+
+    # ---------------- BOOKINGS ---------------- #
+
+    def get_booking(self, booking_id):
+        with self._connection() as conn:
+            row = conn.execute(_select("bookings", BOOKING_COLUMNS) + " WHERE id = ?", (booking_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_active_booking(self, email):
+        with self._connection() as conn:
+            row = conn.execute(
+                _select("bookings", BOOKING_COLUMNS) + " WHERE email = ? AND status = 'ACTIVE'", (email,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def bookings_at(self, slot_start):
+        with self._connection() as conn:
+            rows = conn.execute(
+                _select("bookings", BOOKING_COLUMNS) + " WHERE slot_start = ? AND status = 'ACTIVE'", (slot_start,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def active_bookings(self):
+        with self._connection() as conn:
+            rows = conn.execute(_select("bookings", BOOKING_COLUMNS) + " WHERE status = 'ACTIVE'").fetchall()
+        return [dict(row) for row in rows]
+
+    def active_bookings_on(self, date):
+        # ISO slot_start strings for a date sort between "<date>T" and "<date>U"
+        with self._connection() as conn:
+            rows = conn.execute(
+                _select("bookings", BOOKING_COLUMNS)
+                + " WHERE status = 'ACTIVE' AND slot_start >= ? AND slot_start < ?",
+                (f"{date}T", f"{date}U")
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def _conflict(error):
+        if "slot_start" in str(error):
+            return SlotTaken("Slot already booked")
+        return BookingConflict("User already has an active booking")
+
+    def add_booking(self, booking):
+        try:
+            with self._connection() as conn:
+                conn.execute(_insert("bookings", BOOKING_COLUMNS), _booking_values(booking))
+        except sqlite3.IntegrityError as e:
+            raise self._conflict(e) from e
+
+    def add_bookings(self, bookings):
+        """Store a batch of bookings in one transaction; returns None or the BookingConflict for each."""
+        errors = []
+        with self._transaction() as conn:
+            for booking in bookings:
+                # A savepoint per row lets one conflict fail alone without aborting the batch
+                conn.execute("SAVEPOINT booking")
+                try:
+                    conn.execute(_insert("bookings", BOOKING_COLUMNS), _booking_values(booking))
+                    errors.append(None)
+                except sqlite3.IntegrityError as e:
+                    conn.execute("ROLLBACK TO booking")
+                    errors.append(self._conflict(e))
+                conn.execute("RELEASE booking")
+        return errors
+
+    def cancel_bookings(self, booking_ids):
+        """Cancel ACTIVE bookings in one transaction; returns {id: cancelled booking or None}."""
+        results = {}
+        with self._transaction() as conn:
+            for booking_id in booking_ids:
+                row = conn.execute(
+                    _select("bookings", BOOKING_COLUMNS) + " WHERE id = ? AND status = 'ACTIVE'", (booking_id,)
+                ).fetchone()
+                if row is None:
+                    results[booking_id] = None
+                    continue
+                conn.execute("UPDATE bookings SET status = 'CANCELLED' WHERE id = ?", (booking_id,))
+                results[booking_id] = {**dict(row), "status": "CANCELLED"}
+        return results
+
+    # ---------------- NOTIFICATIONS ---------------- #
+
+    def get_notification(self, notification_id):
+        with self._connection() as conn:
+            row = conn.execute(
+                _select("notifications", NOTIFICATION_FIELDS) + " WHERE id = ?", (notification_id,)
+            ).fetchone()
+        return {**dict(row), "cleared": bool(row["cleared"])} if row else None
+
+    def pending_count(self):
+        # Counts the notifications_pending partial index, which only holds pending rows
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM notifications WHERE cleared = 0").fetchone()[0]
+
+    def pending_notifications(self, email, since=0, limit=None):
+        """Uncleared notifications of ``email`` with seq above ``since``, oldest first."""
+        # Served straight from the (email, seq) partial index; LIMIT -1 means no limit
+        with self._connection() as conn:
+            rows = conn.execute(
+                _select("notifications", NOTIFICATION_FIELDS)
+                + " WHERE email = ? AND cleared = 0 AND seq > ? ORDER BY seq LIMIT ?",
+                (email, since, -1 if limit is None else limit)
+            ).fetchall()
+        return [{**dict(row), "cleared": bool(row["cleared"])} for row in rows]
+
+    def add_notification(self, notification):
+        # Ids are unique, so a repeat insert (e.g. the same reminder from two workers) is a no-op
+        with self._connection() as conn:
+            conn.execute(
+                _insert("notifications", NOTIFICATION_COLUMNS, "INSERT OR IGNORE"),
+                tuple(notification[c] for c in NOTIFICATION_COLUMNS)
+            )
+
+    def clear_notification(self, notification_id):
+        with self._connection() as conn:
+            cursor = conn.execute("UPDATE notifications SET cleared = 1 WHERE id = ?", (notification_id,))
+        return cursor.rowcount > 0
+
+    def clear_notifications(self, notification_ids):
+        """Clear several notifications in one transaction; returns {id: found}."""
+        results = {}
+        with self._transaction() as conn:
+            for notification_id in notification_ids:
+                cursor = conn.execute("UPDATE notifications SET cleared = 1 WHERE id = ?", (notification_id,))
+                results[notification_id] = cursor.rowcount > 0
+        return results
+
+    def clear_all_notifications(self, email):
+        """Clear every pending notification of ``email``; returns the cleared ids."""
+        with self._transaction() as conn:
+            ids = [
+                row["id"] for row in conn.execute(
+                    "SELECT id FROM notifications WHERE email = ? AND cleared = 0 ORDER BY seq", (email,)
+                )
+            ]
+            conn.execute("UPDATE notifications SET cleared = 1 WHERE email = ? AND cleared = 0", (email,))
+        return ids
+
+    # ---------------- ARCHIVE ---------------- #
+
+    def archive(self, before):
+        """Move bookings for days before ``before`` (YYYY-MM-DD), and cleared
+        notifications created before that day, into the archive tables."""
+        booking_columns = ", ".join(BOOKING_COLUMNS)
+        notification_columns = ", ".join(NOTIFICATION_COLUMNS)
+        with self._transaction() as conn:
+            bookings = conn.execute(
+                f"INSERT OR REPLACE INTO bookings_archive ({booking_columns}, month) "
+                f"SELECT {booking_columns}, substr(slot_start, 1, 7) FROM bookings WHERE slot_start < ?",
+                (before,)
+            ).rowcount
+            conn.execute("DELETE FROM bookings WHERE slot_start < ?", (before,))
+            notifications = conn.execute(
+                f"INSERT OR REPLACE INTO notifications_archive ({notification_columns}, month) "
+                f"SELECT {notification_columns}, substr(created_at, 1, 7) FROM notifications "
+                "WHERE cleared = 1 AND created_at < ?",
+                (before,)
+            ).rowcount
+            conn.execute("DELETE FROM notifications WHERE cleared = 1 AND created_at < ?", (before,))
+
+        if bookings or notifications:
+            logger.info(
+                "Archived %s bookings and %s notifications from before %s", bookings, notifications, before
+            )
+        return bookings, notifications
+
+    def history(self, email, start=None, end=None):
+        """Archived bookings and notifications of ``email``, optionally limited to YYYY-MM months."""
+        bounds = (email, start or "0000-00", end or "9999-99")
+        with self._connection() as conn:
+            bookings = conn.execute(
+                _select("bookings_archive", BOOKING_COLUMNS)
+                + " WHERE email = ? AND month >= ? AND month <= ? ORDER BY slot_start",
+                bounds
+            ).fetchall()
+            notifications = conn.execute(
+                _select("notifications_archive", NOTIFICATION_COLUMNS)
+                + " WHERE email = ? AND month >= ? AND month <= ? ORDER BY created_at",
+                bounds
+            ).fetchall()
+        return {
+            "bookings": [dict(row) for row in bookings],
+            "notifications": [{**dict(row), "cleared": bool(row["cleared"])} for row in notifications]
+        }
+
+    def scan_bookings(self):
+        """(slot_start, status) of every booking, live and archived."""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT slot_start, status FROM bookings UNION ALL SELECT slot_start, status FROM bookings_archive"
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+
+if __name__ == "__main__":
+    # Usage: python -m utils.sqlite_repository [DATA_DIR] [DB_PATH]
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    source = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("data")
+    target = Path(sys.argv[2]) if len(sys.argv) > 2 else source / "serveq.db"
+    repository = SqliteRepository(target, pool_size=1)
+    repository.load()
+    repository.import_json(source)
+    repository.stop()
@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml",
+                      "application/manifest+json", "application/xml")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+def parse_accept_encoding(header):
+    """Map each coding in an Accept-Encoding header to its q-value (1 when omitted)."""
+    codings = {}
+    for part in header.split(","):
+        coding, *params = part.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+class Asset:
+    __slots__ = ("path", "file", "media_type", "etag", "cache_control", "body", "gzip", "br")
+
+    def __init__(self, path, file, media_type, etag, cache_control, body=None):
+        self.path = path
+        self.file = file
+        self.media_type = media_type
+        self.etag = etag
+        self.cache_control = cache_control
+        self.body = body
+        self.gzip = None
+        self.br = None
+
+
+class StaticAssets:
+    """Manifest of the built frontend, served from memory.
+
+    At startup every file under ``root`` is indexed. Files up to
+    ``max_inline_bytes`` are kept in memory with precomputed gzip (and, if the
+    ``brotli`` package is installed, brotli) variants and an ETag, so serving
+    them never touches the filesystem. Vite's content-hashed ``assets/*``
+    files are marked immutable; everything else must revalidate.
+    """
+
+    def __init__(self, root, max_inline_bytes=1024 * 1024):
+        self.root = root
+        self.max_inline_bytes = max_inline_bytes
+        self.assets = {}
+        self.index = None
+
+    def load(self):
+        assets = {}
+        if self.root.is_dir():
+            for file in self.root.rglob("*"):
+                if not file.is_file():
+                    continue
+                path = file.relative_to(self.root).as_posix()
+                assets[path] = self._build(path, file)
+
+        self.assets = assets
+        self.index = assets.get("index.html")
+        inline = sum(1 for a in assets.values() if a.body is not None)
+        logger.info("Static manifest built: %s files (%s held in memory)", len(assets), inline)
+
+    def _build(self, path, file):
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if media_type.startswith("text/") or media_type == "application/javascript":
+            media_type += "; charset=utf-8"
+        cache_control = IMMUTABLE if path.startswith("assets/") else REVALIDATE
+
+        size = file.stat().st_size
+        if size > self.max_inline_bytes:
+            stat = file.stat()
+            etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+            return Asset(path, file, media_type, etag, cache_control)
+
+        body = file.read_bytes()
+        etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+        asset = Asset(path, file, media_type, etag, cache_control, body)
+
+        if media_type.startswith(COMPRESSIBLE_TYPES) and len(body) > 256:
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                asset.gzip = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    asset.br = compressed
+        return asset
+
+    def get(self, path):
+        return self.assets.get(path)
+
+    def select(self, asset, accept_encoding):
+        """Pick the body the client prefers: (body, content-encoding or None).
+
+        Only codings accepted with q > 0, listed or through ``*``, qualify;
+        among equally preferred ones the smallest body wins.
+        """
+        codings = parse_accept_encoding(accept_encoding)
+        best = None
+        for coding, body in (("br", asset.br), ("gzip", asset.gzip)):
+            q = codings.get(coding, codings.get("*", 0))
+            if body is not None and q > 0 and (best is None or (q, -len(body)) > best[0]):
+                best = ((q, -len(body)), body, coding)
+        if best is None:
+            return asset.body, None
+        return best[1], best[2]
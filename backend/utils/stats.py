@@ -0,0 +1,116 @@
+import threading
+import time
+from datetime import date as Date, timedelta
+
+BOOKINGS, ACTIVE, CANCELLED = range(3)
+
+
+class OccupancyStats:
+    """Materialized booking counters per date and slot start, for admin reports.
+
+    Every booking ever made, live or archived, counts once towards its date
+    and ``HH:MM`` slot start: in ``bookings`` (demand) and under its current
+    status. The counters are rebuilt from storage at startup and then follow
+    bookings and cancellations through BookingEngine listeners, so a report
+    walks only the days it covers, however many bookings they hold. Archiving
+    does not touch them.
+
+    When several processes write bookings (``refresh_after`` > 0), the
+    counters are rebuilt from storage once they are older than
+    ``refresh_after`` seconds.
+    """
+
+    def __init__(self, repository, refresh_after=0):
+        self.repository = repository
+        self.refresh_after = refresh_after
+        self._lock = threading.Lock()
+        # date -> {"HH:MM": [bookings, active, cancelled]}
+        self._days = {}
+        self._loaded_at = 0
+
+    @staticmethod
+    def _count(days, slot_start, status):
+        counts = days.setdefault(slot_start[:10], {}).setdefault(slot_start[11:16], [0, 0, 0])
+        counts[BOOKINGS] += 1
+        if status == "ACTIVE":
+            counts[ACTIVE] += 1
+        elif status == "CANCELLED":
+            counts[CANCELLED] += 1
+
+    def rebuild(self, facts):
+        """Recount from (slot_start, status) pairs, e.g. ``repository.scan_bookings()``."""
+        days = {}
+        for slot_start, status in facts:
+            self._count(days, slot_start, status)
+        with self._lock:
+            self._days = days
+            self._loaded_at = time.monotonic()
+
+    def add(self, booking):
+        with self._lock:
+            self._count(self._days, booking["slot_start"], booking["status"])
+
+    def cancel(self, booking):
+        with self._lock:
+            counts = self._days.get(booking["slot_start"][:10], {}).get(booking["slot_start"][11:16])
+            if counts is None or not counts[ACTIVE]:
+                return
+            counts[ACTIVE] -= 1
+            counts[CANCELLED] += 1
+
+    @staticmethod
+    def _row(counts, capacity):
+        bookings, active, cancelled = counts
+        return {
+            "bookings": bookings,
+            "active": active,
+            "cancelled": cancelled,
+            "capacity": capacity,
+            "utilization": round(active / capacity, 4) if capacity else None
+        }
+
+    def report(self, start, end, schedule=None):
+        """Counters for YYYY-MM-DD dates ``start`` to ``end`` inclusive, per day,
+        per hour of day and per slot start. Capacity comes from ``schedule``."""
+        if self.refresh_after and time.monotonic() - self._loaded_at > self.refresh_after:
+            self.rebuild(self.repository.scan_bookings())
+
+        first, last = Date.fromisoformat(start), Date.fromisoformat(end)
+        totals = [0, 0, 0]
+        total_capacity = 0
+        days, hours, slots = [], {}, {}
+        with self._lock:
+            for offset in range((last - first).days + 1):
+                date = (first + timedelta(days=offset)).isoformat()
+                day_counts = self._days.get(date, {})
+
+                capacities = {}
+                if schedule is not None:
+                    for slot in schedule.template(date):
+                        capacities[f"{slot.minute // 60:02d}:{slot.minute % 60:02d}"] = slot.capacity
+
+                day = [0, 0, 0]
+                for start_time in day_counts.keys() | capacities.keys():
+                    counts = day_counts.get(start_time, (0, 0, 0))
+                    capacity = capacities.get(start_time, 0)
+                    for key, index in ((start_time[:2] + ":00", hours), (start_time, slots)):
+                        row = index.setdefault(key, [0, 0, 0, 0])
+                        for i in range(3):
+                            row[i] += counts[i]
+                        row[3] += capacity
+                    for i in range(3):
+                        day[i] += counts[i]
+                day_capacity = sum(capacities.values())
+                days.append({"date": date, **self._row(day, day_capacity)})
+                for i in range(3):
+                    totals[i] += day[i]
+                total_capacity += day_capacity
+
+        return {
+            "from": start,
+            "to": end,
+            "totals": self._row(totals, total_capacity),
+            "days": days,
+            "hours": [{"hour": hour, **self._row(row[:3], row[3])} for hour, row in sorted(hours.items())],
+            "slots": [{"start": start_time, **self._row(row[:3], row[3])} for start_time, row in sorted(slots.items())]
+        }
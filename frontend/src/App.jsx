@@ -27,7 +27,7 @@ function App() {
         }} />
       )}
 
-      {step === "queue" && <Queue slot={slot} />}
+      {step === "queue" && <Queue email={email} slot={slot} />}
     </>
   );
 }
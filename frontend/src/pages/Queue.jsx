@@ -1,26 +1,39 @@
 import { useEffect, useState } from "react";
+import { fetchQueue, subscribeEvents } from "../services/api";
 
-export default function Queue({ slot }) {
-  const [position, setPosition] = useState(5);
+export default function Queue({ email, slot }) {
+  const [queue, setQueue] = useState(null);
+  const [reminder, setReminder] = useState(null);
 
   useEffect(() => {
-    const timer = setInterval(() => {
-      setPosition(p => (p > 1 ? p - 1 : 1));
-    }, 4000);
+    const refresh = () => fetchQueue(email).then(setQueue).catch(() => {});
+    refresh();
+    const timer = setInterval(refresh, 30000);
     return () => clearInterval(timer);
-  }, []);
+  }, [email]);
+
+  useEffect(() => {
+    return subscribeEvents({ email }, {
+      notification: (n) => {
+        if (n.type === "REMINDER") setReminder(n.message);
+      },
+    });
+  }, [email]);
 
   return (
     <div className="card">
       <h2>Queue Status</h2>
       <div className="queue-box">
         <p><strong>Slot:</strong> {slot}</p>
-        <p><strong>Position:</strong> {position}</p>
+        <p><strong>Position:</strong> {queue ? queue.position : "…"}</p>
+        {queue && (
+          <p><strong>Estimated wait:</strong> {queue.estimated_wait_minutes} min</p>
+        )}
       </div>
 
-      {position === 1 && (
+      {reminder && (
         <div className="banner success">
-          🔔 Your appointment is in 10 minutes
+          🔔 {reminder}
         </div>
       )}
     </div>
@@ -1,5 +1,5 @@
-import { useEffect, useState } from "react";
-import { fetchSlots, bookSlot } from "../services/api";
+import { useCallback, useEffect, useState } from "react";
+import { fetchSlotRange, bookSlot, subscribeEvents } from "../services/api";
 
 function getNext7Days() {
   return [...Array(7)].map((_, i) => {
@@ -11,16 +11,47 @@ function getNext7Days() {
 
 export default function Slots({ email, onBooked }) {
   const dates = getNext7Days();
+  const firstDate = dates[0];
   const [selectedDate, setSelectedDate] = useState(dates[0]);
-  const [slots, setSlots] = useState([]);
+  const [slotsByDate, setSlotsByDate] = useState({});
+  const slots = slotsByDate[selectedDate] || [];
 
+  // One request for the whole week instead of one per selected day
+  const loadWeek = useCallback(() => {
+    return fetchSlotRange(firstDate, 7).then(res => {
+      setSlotsByDate(Object.fromEntries(res.days.map(d => [d.date, d.slots])));
+    }).catch(() => {});
+  }, [firstDate]);
+
+  useEffect(() => {
+    loadWeek();
+  }, [loadWeek]);
+
+  // Update remaining seats as other users book, greying out full slots. After a
+  // dropped connection the week is reloaded, since missed events are not replayed.
   useEffect(() => {
-    fetchSlots(selectedDate).then(res => setSlots(res.slots));
-  }, [selectedDate]);
+    return subscribeEvents({ date: selectedDate }, {
+      slot_taken: (taken) => setSlotsByDate(prev => ({
+        ...prev,
+        [taken.date]: (prev[taken.date] || []).map(s =>
+          s.start === taken.start
+            ? taken.available > 0
+              ? { ...s, available: taken.available }
+              : { ...s, available: 0, is_booked: true, is_bookable: false }
+            : s
+        ),
+      })),
+    }, { onReconnect: loadWeek });
+  }, [selectedDate, loadWeek]);
 
   const book = async (slot) => {
     if (!slot.is_bookable) return;
-    await bookSlot(email, `${selectedDate} ${slot.start}-${slot.end}`);
+    try {
+      await bookSlot(email, `${selectedDate} ${slot.start}-${slot.end}`);
+    } finally {
+      // Booked or lost to someone else, the seat counts have changed
+      loadWeek();
+    }
     onBooked(`${selectedDate} ${slot.start} - ${slot.end}`);
   };
 
@@ -48,6 +79,7 @@ export default function Slots({ email, onBooked }) {
           style={{ opacity: s.is_bookable ? 1 : 0.5 }}
         >
           {s.start} – {s.end}
+          {s.capacity > 1 && ` (${s.available} left)`}
         </button>
       ))}
     </div>
@@ -41,6 +41,24 @@ export async function fetchSlots(date) {
   return data;
 }
 
+export async function fetchSlotRange(from, days) {
+  const res = await fetch(`${BASE_URL}/api/slots/range?from=${from}&days=${days}`);
+  const data = await res.json();
+  if (!res.ok) {
+    throw new Error(data.detail || "Failed to fetch slots");
+  }
+  return data;
+}
+
+export async function fetchQueue(email) {
+  const res = await fetch(`${BASE_URL}/api/queue?email=${encodeURIComponent(email)}`);
+  const data = await res.json();
+  if (!res.ok) {
+    throw new Error(data.detail || "Failed to fetch queue position");
+  }
+  return data;
+}
+
 export async function bookSlot(email, slot) {
   const res = await fetch(`${BASE_URL}/api/book`, {
     method: "POST",
@@ -54,3 +72,23 @@ export async function bookSlot(email, slot) {
   }
   return data;
 }
+
+// Server-sent events for an email and/or a date; returns a function that closes the stream.
+// onReconnect runs each time the stream comes back after dropping.
+export function subscribeEvents({ email, date }, handlers, { onReconnect } = {}) {
+  const params = new URLSearchParams();
+  if (email) params.set("email", email);
+  if (date) params.set("date", date);
+
+  const source = new EventSource(`${BASE_URL}/api/events?${params}`);
+  Object.entries(handlers).forEach(([event, handler]) => {
+    source.addEventListener(event, (e) => handler(JSON.parse(e.data)));
+  });
+  // EventSource reconnects by itself; events sent while it was down are lost
+  let connected = false;
+  source.addEventListener("open", () => {
+    if (connected && onReconnect) onReconnect();
+    connected = true;
+  });
+  return () => source.close();
+}